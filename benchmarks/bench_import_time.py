@@ -0,0 +1,57 @@
+"""Benchmark of the import time of py_simple_report.
+A bare "import py_simple_report" must not import the plotting stack.
+This script fails if a plotting module is found in sys.modules after it.
+
+Usage:
+    python benchmarks/bench_import_time.py
+"""
+import subprocess
+import sys
+
+PLOTTING_MODULES = [
+    "matplotlib",
+    "seaborn",
+    "cmocean",
+    "contextplt",
+    "japanize_matplotlib",
+]
+
+CODE = """
+import sys, time
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+loaded = sorted({{ m.split(".")[0] for m in sys.modules}} & set({plotting}))
+print(t*1000, ",".join(loaded))
+"""
+
+def measure(module : str, repeat : int = 5):
+    """Import the module in fresh interpreters.
+
+    Returns:
+        The minimum import time in ms and plotting modules loaded.
+    """
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", CODE.format(module=module, plotting=PLOTTING_MODULES)],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1].split(",") if len(out) > 1 else []
+    return(min(times), loaded)
+
+def main() -> None:
+    print(f"{'import':>32} {'time [ms]':>10}  plotting modules")
+    results = {}
+    for module in ["py_simple_report", "py_simple_report.vis_utils"]:
+        t, loaded = measure(module)
+        results[module] = loaded
+        print(f"{module:>32} {t:>10.1f}  {', '.join(loaded)}")
+    if results["py_simple_report"]:
+        raise SystemExit(
+            f"Plotting modules are imported by 'import py_simple_report': "
+            f"{results['py_simple_report']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark of utils.imputate_reorder_table against the previous implementation
+which inserted missing rows and columns one by one.
+
+Usage:
+    python benchmarks/bench_imputate_reorder_table.py
+"""
+from typing import List
+import os
+import sys
+import timeit
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Run from a checkout without installing py_simple_report.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_simple_report import utils
+
+def imputate_reorder_table_legacy(
+    table_: pd.DataFrame, 
+    cols_: List[str], 
+    rows_: List[str], 
+    fill_value: int = 0,
+    allow_except: bool = True 
+) -> pd.DataFrame:
+    """Implementation before the reindex-based one.
+    """
+    cols_ = cols_.copy()
+    rows_ = rows_.copy()
+    for c in cols_:
+        if c not in table_.columns:
+            table_[c]=0
+    for i in rows_:
+        if i not in table_.index:
+            table_.loc[i]=0
+    for c in table_.columns:
+        if c == "All":
+            cols_.append(c)
+    for i in table_.index:
+        if i == "All":
+            rows_.append(i)
+    if allow_except:
+        for c in table_.columns:
+            if c not in cols_:
+                cols_.append(c) 
+        for i in table_.index:
+            if i not in rows_:
+                rows_.append(i)
+    else:
+        if set(table_.columns) != set(cols_):
+            raise Exception("Columns include some irregular items")
+    table_ = table_[cols_] 
+    table_ = table_.loc[rows_]
+    return(table_)
+
+def create_table(n_rows : int, n_cols : int, observed : float = 0.5, seed : int = 0):
+    """Crosstab-like table whose part of rows and columns are not observed.
+    """
+    rng = np.random.default_rng(seed)
+    rows = [ f"r{i}" for i in range(n_rows)]
+    cols = [ f"c{i}" for i in range(n_cols)]
+    obs_rows = [ r for r in rows if rng.random() < observed] + ["All"]
+    obs_cols = [ c for c in cols if rng.random() < observed] + ["All"]
+    tab = pd.DataFrame(rng.integers(0, 100, (len(obs_rows), len(obs_cols))),
+                       index=obs_rows, columns=obs_cols)
+    return(tab, rows, cols)
+
+def main(number : int = 5) -> None:
+    print(f"{'rows':>5} {'cols':>5} {'legacy [ms]':>12} {'reindex [ms]':>13} {'ratio':>6}")
+    for n_rows, n_cols in [(5, 5), (10, 20), (50, 50), (100, 200)]:
+        tab, rows, cols = create_table(n_rows, n_cols)
+        t_old = timeit.timeit(
+            lambda: imputate_reorder_table_legacy(tab.copy(), cols, rows), number=number)
+        t_new = timeit.timeit(
+            lambda: utils.imputate_reorder_table(tab.copy(), cols, rows), number=number)
+        t_old, t_new = t_old/number*1000, t_new/number*1000
+        print(f"{n_rows:>5} {n_cols:>5} {t_old:>12.2f} {t_new:>13.2f} {t_old/t_new:>6.1f}")
+
+if __name__ == "__main__":
+    # The legacy implementation fragments DataFrame on purpose.
+    warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark of peak memory of tabulation against the width of DataFrame.
+Only the used columns should be touched, so the peak allocation traced by
+tracemalloc should not grow with the number of unused columns.
+This script fails if it grows more than "tolerance" times.
+
+Usage:
+    python benchmarks/bench_memory_columns.py
+"""
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Run from a checkout without installing py_simple_report.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import py_simple_report as psr
+from py_simple_report import main as psr_main
+
+def create_data(n_rows : int, n_unused : int, seed : int = 0):
+    rng = np.random.default_rng(seed)
+    data = {
+        "strf" : rng.choice([1, 2, 3, np.nan], n_rows),
+        "q1" : rng.choice([1, 2, 3, 4], n_rows).astype(float),
+        "b1" : rng.choice([0, 1, np.nan], n_rows),
+        "b2" : rng.choice([0, 1, np.nan], n_rows),
+    }
+    for i in range(n_unused):
+        data[f"unused{i}"] = rng.random(n_rows)
+    df = pd.DataFrame(data)
+    df_var = pd.DataFrame({
+        "var_name" : ["strf", "q1", "b1", "b2"],
+        "item" : ["1=A,2=B,3=C", "1=a,2=b,3=c,4=d", "0=no,1=yes", "0=no,1=yes"],
+        "desc" : ["Strata", "Q1", "B1", "B2"],
+    })
+    qdcs_dic = psr.question_data_containers_from_dataframe(df_var, "var_name", "item", "desc")
+    return(df, qdcs_dic)
+
+def peak_memory(func) -> float:
+    """Peak memory in MB traced while func is called.
+    """
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return(peak/1e6)
+
+def main(n_rows : int = 100_000, tolerance : float = 1.5) -> None:
+    cases = {
+        "crosstab_data" : lambda df, dic: psr_main.crosstab_data(
+            df, dic["q1"], dic["strf"]),
+        "multi_binaries" : lambda df, dic: psr_main.obtain_multi_binaries_items_with_strat(
+            df, ["b1", "b2"], dic, dic["strf"]),
+        "output_multi_binaries" : lambda df, dic: psr.output_multi_binaries_with_strat(
+            df, ["b1", "b2"], dic, dic["strf"], show=False, headless=True),
+        "heatmap_crosstab" : lambda df, dic: psr.heatmap_crosstab_from_df(
+            df, dic["q1"], dic["strf"], normalize="index", show=False),
+    }
+    widths = [0, 50, 200]
+    print(f"{'':>22} " + " ".join(f"{str(w) + ' cols [MB]':>14}" for w in widths))
+    failed = []
+    for name, func in cases.items():
+        peaks = []
+        for n_unused in widths:
+            df, dic = create_data(n_rows, n_unused)
+            func(df, dic) # warm up imports and caches.
+            peaks.append(peak_memory(lambda: func(df, dic)))
+        print(f"{name:>22} " + " ".join(f"{p:>14.2f}" for p in peaks))
+        if peaks[-1] > peaks[0]*tolerance:
+            failed.append(name)
+    if failed:
+        raise SystemExit(f"Peak memory grows with unused columns: {failed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark of the per-figure cost of vis_utils.SingleVis.
+Figures created through pyplot's figure manager (previous implementation)
+are compared with figures created from matplotlib.figure.Figure and
+FigureCanvasAgg. Rendering from a thread pool is also measured.
+
+Usage:
+    python benchmarks/bench_render_figure.py
+"""
+import concurrent.futures
+import io
+import os
+import sys
+import time
+import timeit
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+# Run from a checkout without installing py_simple_report.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_simple_report import variables as vs
+from py_simple_report import vis_utils
+
+class SingleVisPyplot(vis_utils.SingleVis):
+    """SingleVis whose figure is managed by pyplot as before.
+    """
+    def __init__(self, vis_var : vs.VisVariables) -> None:
+        self.vis_var = vis_var
+        self.fig = plt.figure(figsize=vis_var.figsize, dpi=vis_var.dpi)
+        self.ax = self.fig.add_subplot(111)
+
+    def close(self) -> None:
+        plt.close(self.fig)
+
+def create_table(n_rows : int = 4, n_cols : int = 5, seed : int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    values = rng.random((n_rows, n_cols))
+    values = values/values.sum(axis=1, keepdims=True)*100
+    return(pd.DataFrame(values,
+                        index=[ f"r{i}" for i in range(n_rows)],
+                        columns=[ f"c{i}" for i in range(n_cols)]))
+
+def render(cls, tab : pd.DataFrame) -> None:
+    vis_var = vs.VisVariables(show=False)
+    vis_var.save_fig_path = io.BytesIO()
+    vis_var.colors = vis_utils.obtain_cmap4labels(list(tab.columns), None, vis_var).colors
+    cls(vis_var).crosstab_cate_stacked_barplot(tab)
+
+def figure_only(cls) -> None:
+    vis = cls(vs.VisVariables(show=False))
+    vis.close()
+
+def main(number : int = 20, n_threads : int = 4) -> None:
+    tab = create_table()
+    print(f"{'':>22} {'pyplot [ms]':>12} {'Figure [ms]':>12} {'ratio':>6}")
+    for name, func in [("create and close", figure_only),
+                       ("stacked barplot", lambda cls: render(cls, tab))]:
+        t_old = timeit.timeit(lambda: func(SingleVisPyplot), number=number)/number*1000
+        t_new = timeit.timeit(lambda: func(vis_utils.SingleVis), number=number)/number*1000
+        print(f"{name:>22} {t_old:>12.2f} {t_new:>12.2f} {t_old/t_new:>6.1f}")
+
+    t = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(n_threads) as executor:
+        futures = [ executor.submit(render, vis_utils.SingleVis, tab) for _ in range(number)]
+        for future in futures:
+            future.result()
+    t = (time.perf_counter() - t)/number*1000
+    print(f"{'thread pool (' + str(n_threads) + ')':>22} {'-':>12} {t:>12.2f}")
+
+if __name__ == "__main__":
+    main()
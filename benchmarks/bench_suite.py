@@ -0,0 +1,236 @@
+"""Benchmark suite timing each stage of report generation separately:
+parsing item strings, decoding, tabulation, reordering, CSV writing,
+annotation, rendering to PNG and the output_* entry points.
+Count tables loaded from cache.ReportCache (cache_table_hit) are compared
+with those counted and stored (cache_table_miss).
+Synthetic surveys are created by synthetic.create_survey.
+
+Medians are compared with baselines stored in benchmarks/baselines.json
+for the same data size. This script fails if a stage is slower than
+"tolerance" times its baseline. Baselines depend on the machine,
+so store them again with "--save" on a new machine.
+
+Usage:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --rows 100000 --vars 50 --save
+    python benchmarks/bench_suite.py --stages decode tabulation
+"""
+from typing import Optional, List, Dict, Callable, Any
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+# Run from a checkout without installing py_simple_report.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import py_simple_report as psr
+from py_simple_report import main as psr_main
+from py_simple_report import tabulation, utils, vis_utils
+from py_simple_report import variables as vs
+
+from synthetic import create_survey
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+def measure(
+    func : Callable[[Any], None],
+    setup : Optional[Callable[[], Any]] = None,
+    repeat : int = 5,
+) -> float:
+    """Median time of func in ms. If setup is given, its return value is
+    passed to func and the time of setup is not included.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        t = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - t)
+    return(float(np.median(times))*1000)
+
+class Stages():
+    def __init__(self, df : pd.DataFrame, df_var : pd.DataFrame, tmp_dir : str) -> None:
+        """Prepare inputs of each stage, so only the stage itself is timed.
+        """
+        self.df = df
+        self.df_var = df_var
+        self.tmp_dir = tmp_dir
+        self.qdcs_dic = psr.question_data_containers_from_dataframe(
+            df_var, "var_name", "item", "desc")
+        self.qdc_strf = self.qdcs_dic["strf"]
+        self.q_names = [ v for v in self.qdcs_dic.keys() if v.startswith("q")]
+        self.b_names = [ v for v in self.qdcs_dic.keys() if v.startswith("b")]
+        self.tables = [ psr_main.crosstab_data(df, self.qdcs_dic[v], self.qdc_strf)
+                        for v in self.q_names]
+        # Tables whose part of rows and columns are not observed.
+        self.raw_tables = [ tab.iloc[::2, ::2] for tab in self.tables]
+        self.plot_table = utils.delete_All_from_index_column(self.tables[0])
+
+    def item_str2dict(self, _) -> None:
+        for item in self.df_var["item"]:
+            utils.item_str2dict(item)
+
+    def question_data_containers(self, _) -> None:
+        psr.question_data_containers_from_dataframe(self.df_var, "var_name", "item", "desc")
+
+    def decode(self, _) -> None:
+        for v in self.q_names:
+            tabulation.decode_labels(self.df[v], self.qdcs_dic[v])
+
+    def tabulation(self, _) -> None:
+        for v in self.q_names:
+            psr_main.crosstab_data(self.df, self.qdcs_dic[v], self.qdc_strf)
+
+    def cache_table_miss_setup(self) -> Any:
+        return(psr.ReportCache(tempfile.mkdtemp(dir=self.tmp_dir)))
+
+    def cache_table_miss(self, cache : Any) -> None:
+        with cache.session():
+            for v in self.q_names:
+                psr_main.crosstab_result(self.df, self.qdcs_dic[v], self.qdc_strf, cache=cache)
+
+    def cache_table_hit_setup(self) -> Any:
+        cache = self.cache_table_miss_setup()
+        self.cache_table_miss(cache)
+        return(cache)
+
+    def cache_table_hit(self, cache : Any) -> None:
+        self.cache_table_miss(cache)
+
+    def reorder(self, _) -> None:
+        qdc = self.qdcs_dic[self.q_names[0]]
+        for tab in self.raw_tables:
+            utils.imputate_reorder_table(tab, list(qdc.order), list(self.qdc_strf.order))
+
+    def csv(self, _) -> None:
+        path = os.path.join(self.tmp_dir, "number.csv")
+        with utils.NumberWriter(path) as writer:
+            for v, tab in zip(self.q_names, self.tables):
+                writer.write(tab, title=v, decimal=2)
+
+    def annotate_setup(self) -> Any:
+        vis = vis_utils.SingleVis(vs.VisVariables(show=False))
+        self.plot_table.plot(kind="barh", ax=vis.ax, stacked=True)
+        return(vis)
+
+    def annotate(self, vis : Any) -> None:
+        n_rows, n_cols = self.plot_table.shape
+        vis_utils.annotate_horizontal_stacked_barplot(vis.ax, n_rows, n_cols)
+        vis.close()
+
+    def render_png(self, _) -> None:
+        vis_var = vs.VisVariables(show=False)
+        vis_var.save_fig_path = io.BytesIO()
+        vis_var = vis_utils.obtain_cmap4labels(list(self.plot_table.columns), None, vis_var)
+        vis_utils.SingleVis(vis_var).crosstab_cate_stacked_barplot(self.plot_table)
+
+    def output_crosstab(self, _) -> None:
+        v = self.q_names[0]
+        psr.output_crosstab_cate_barplot(
+            self.df, self.qdcs_dic[v], self.qdc_strf, show=False,
+            save_fig_path=os.path.join(self.tmp_dir, f"{v}.png"),
+            save_num_path=os.path.join(self.tmp_dir, "output.csv"))
+
+    def output_multi_binaries(self, _) -> None:
+        psr.output_multi_binaries_with_strat(
+            self.df, self.b_names, self.qdcs_dic, self.qdc_strf, show=False,
+            save_fig_path=os.path.join(self.tmp_dir, "binaries.png"),
+            save_num_path=os.path.join(self.tmp_dir, "output.csv"))
+
+    def output_numbers(self, _) -> None:
+        path = os.path.join(self.tmp_dir, "numbers.csv")
+        with utils.NumberWriter(path) as writer:
+            for v in self.q_names:
+                psr.output_crosstab_cate_barplot(
+                    self.df, self.qdcs_dic[v], self.qdc_strf, show=False,
+                    save_num_path=writer, headless=True)
+
+STAGES = [
+    "item_str2dict", "question_data_containers", "decode", "tabulation",
+    "cache_table_miss", "cache_table_hit", "reorder",
+    "csv", "annotate", "render_png", "output_crosstab", "output_multi_binaries",
+    "output_numbers",
+]
+
+def run(config : Dict[str, Any], stages : List[str], repeat : int) -> Dict[str, float]:
+    df, df_var = create_survey(**config)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench = Stages(df, df_var, tmp_dir)
+        for name in stages:
+            setup = getattr(bench, name + "_setup", None)
+            results[name] = measure(getattr(bench, name), setup=setup, repeat=repeat)
+    return(results)
+
+def config_key(config : Dict[str, Any]) -> str:
+    return(",".join(f"{k}={v}" for k, v in config.items()))
+
+def load_baselines(path : str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return({})
+    with open(path) as f:
+        return(json.load(f))
+
+def save_baseline(path : str, config : Dict[str, Any], results : Dict[str, float]) -> None:
+    baselines = load_baselines(path)
+    entry = baselines.get(config_key(config), {"results" : {}})
+    entry["machine"] = f"{platform.system()} {platform.machine()} {platform.processor()}".strip()
+    entry["python"] = platform.python_version()
+    entry["version"] = psr.__version__
+    entry["results"].update({ k : round(v, 3) for k, v in results.items()})
+    baselines[config_key(config)] = entry
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--vars", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--missing", type=float, default=0.05)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="a stage fails if it is slower than tolerance times baseline.")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="differences smaller than this are ignored.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="store results as baselines.")
+    args = parser.parse_args()
+
+    config = dict(n_rows=args.rows, n_vars=args.vars, n_categories=args.categories,
+                  missing_rate=args.missing)
+    results = run(config, args.stages, args.repeat)
+    baseline = load_baselines(args.baseline).get(config_key(config), {}).get("results", {})
+
+    print(config_key(config))
+    print(f"{'stage':>26} {'median [ms]':>12} {'baseline [ms]':>14} {'ratio':>6}")
+    failed = []
+    for name, t in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:>26} {t:>12.2f} {'-':>14} {'-':>6}")
+            continue
+        print(f"{name:>26} {t:>12.2f} {base:>14.2f} {t/base:>6.2f}")
+        if (t > base*args.tolerance) and (t - base > args.min_ms):
+            failed.append(name)
+
+    if args.save:
+        save_baseline(args.baseline, config, results)
+        print(f"Baselines are saved in {args.baseline}")
+    elif failed:
+        raise SystemExit(f"Slower than {args.tolerance} times baselines: {failed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Checks that optimized paths give the same results as the straightforward
+ones they replace, on synthetic surveys created by synthetic.create_survey.
+Each check raises AssertionError at the first difference.
+This script fails if any check fails.
+
+Usage:
+    python benchmarks/check_equivalence.py
+    python benchmarks/check_equivalence.py --rows 100000 --checks render
+"""
+import argparse
+import contextlib
+import filecmp
+import itertools
+import os
+import sys
+import tempfile
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+# Run from a checkout without installing py_simple_report.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import py_simple_report as psr
+from py_simple_report import association
+from py_simple_report import main as psr_main
+from py_simple_report import tabulation
+
+from synthetic import create_survey
+
+def assert_same_files(dir_a : str, dir_b : str) -> None:
+    names = sorted(os.listdir(dir_a))
+    assert names == sorted(os.listdir(dir_b)), f"{dir_a} and {dir_b} have different files"
+    _, mismatch, errors = filecmp.cmpfiles(dir_a, dir_b, names, shallow=False)
+    assert not (mismatch or errors), f"files differ: {mismatch + errors}"
+
+class Checks():
+    def __init__(self, df : pd.DataFrame, df_var : pd.DataFrame, tmp_dir : str) -> None:
+        # Weights of respondents for weighted tabulation.
+        self.df = df.assign(weight=np.random.default_rng(0).uniform(0.5, 2, len(df)))
+        self.tmp_dir = tmp_dir
+        self.qdcs_dic = psr.question_data_containers_from_dataframe(
+            df_var, "var_name", "item", "desc")
+        self.qdc_strf = self.qdcs_dic["strf"]
+        self.q_names = [ v for v in self.qdcs_dic.keys() if v.startswith("q")]
+        self.b_names = [ v for v in self.qdcs_dic.keys() if v.startswith("b")]
+
+    def directory(self, name : str) -> str:
+        path = os.path.join(self.tmp_dir, name)
+        os.makedirs(path)
+        return(path)
+
+    def render(self) -> None:
+        """Figures rendered by render.ParallelRenderer are byte-identical
+        to those rendered in the current process.
+        """
+        batch = psr.ReportBatch(self.df, self.qdcs_dic, ["strf"], var_names=self.q_names[:4])
+        dirs = []
+        for n_workers in [1, 2]:
+            path = self.directory(f"render_{n_workers}")
+            batch.output(save_fig_path=os.path.join(path, "{var_name}_{strf_name}.png"),
+                         n_workers=n_workers)
+            with contextlib.ExitStack() as stack:
+                renderer = None
+                if n_workers > 1:
+                    renderer = stack.enter_context(psr.ParallelRenderer(n_workers))
+                psr.heatmap_crosstab_from_df(
+                    self.df, self.qdc_strf, self.qdcs_dic[self.q_names[0]], show=False,
+                    save_fig_path=os.path.join(path, "heatmap.png"), renderer=renderer)
+                psr.output_multi_binaries_with_strat(
+                    self.df, self.b_names, self.qdcs_dic, self.qdc_strf, show=False,
+                    save_fig_path=os.path.join(path, "binaries.png"), renderer=renderer)
+            dirs.append(path)
+        assert_same_files(*dirs)
+
+    def rollup(self) -> None:
+        """Tables of ReportBatch, rolled up from one joint count table of
+        the finest strata, are equal to tables tabulated directly.
+        """
+        strata = ["strf", self.q_names[-1], ("strf", self.q_names[-1])]
+        batch = psr.ReportBatch(self.df, self.qdcs_dic, strata, var_names=self.q_names[:4])
+        for (var_name, _), result in batch.run().items():
+            direct = psr_main.crosstab_result(self.df, self.qdcs_dic[var_name], result.qdc_strf)
+            np.testing.assert_array_equal(result.counts, direct.counts)
+            for percentage in [True, False]:
+                pd.testing.assert_frame_equal(result.table(percentage), direct.table(percentage))
+
+    def shard(self) -> None:
+        """Counts summed up over shards of shard.ShardPool are equal to those
+        of one process. Weighted counts are compared up to rounding.
+        """
+        with psr.ShardPool(n_workers=2) as pool:
+            for weights in [None, "weight"]:
+                for var_name in self.q_names[:4]:
+                    qdc = self.qdcs_dic[var_name]
+                    serial = psr_main.crosstab_result(self.df, qdc, self.qdc_strf, weights=weights)
+                    sharded = psr_main.crosstab_result(
+                        self.df, qdc, self.qdc_strf, weights=weights, n_workers=pool)
+                    np.testing.assert_allclose(sharded.counts, serial.counts, rtol=1e-12)
+                    if weights is None:
+                        np.testing.assert_array_equal(sharded.counts, serial.counts)
+                    else:
+                        np.testing.assert_array_equal(sharded.raw_counts, serial.raw_counts)
+                    pd.testing.assert_series_equal(
+                        psr_main.one_cate_bar_data(self.df, qdc, weights=weights, n_workers=pool),
+                        psr_main.one_cate_bar_data(self.df, qdc, weights=weights), rtol=1e-12)
+                serial = psr_main.multi_binaries_result(
+                    self.df, self.b_names, self.qdcs_dic, self.qdc_strf, weights=weights)
+                sharded = psr_main.multi_binaries_result(
+                    self.df, self.b_names, self.qdcs_dic, self.qdc_strf, weights=weights,
+                    n_workers=pool)
+                pd.testing.assert_frame_equal(sharded.number, serial.number, rtol=1e-12)
+                pd.testing.assert_frame_equal(sharded.percentage, serial.percentage, rtol=1e-12)
+
+    def chunked(self) -> None:
+        """Counts of stream.ChunkedTabulator summed up chunk by chunk, including
+        those saved, loaded and updated with appended rows, are equal to 
+        those of the whole DataFrame.
+        """
+        path = os.path.join(self.tmp_dir, "survey.csv")
+        self.df.to_csv(path, index=False)
+        var_names = self.q_names[:4]
+        for weights in [None, "weight"]:
+            tabulator = psr.ChunkedTabulator(
+                self.qdcs_dic, ["strf"], var_names=var_names, 
+                multi_binaries={"binaries" : self.b_names}, weights=weights)
+            tabulator.update_from_source(path, chunksize=max(len(self.df)//7, 1))
+
+            # Half of rows are counted, saved and the rest are appended.
+            appended = psr.ChunkedTabulator(
+                self.qdcs_dic, ["strf"], var_names=var_names, 
+                multi_binaries={"binaries" : self.b_names}, weights=weights)
+            pkl_path = os.path.join(self.tmp_dir, "counts.pkl")
+            appended.update(self.df.iloc[:len(self.df)//2]).save(pkl_path)
+            appended = psr.ChunkedTabulator.load(pkl_path, self.qdcs_dic)
+            appended.update_appended(self.df)
+
+            for tab in [tabulator, appended]:
+                for var_name in var_names:
+                    full = psr_main.crosstab_result(
+                        self.df, self.qdcs_dic[var_name], self.qdc_strf, weights=weights)
+                    chunked = tab.crosstab_result(var_name, "strf")
+                    np.testing.assert_allclose(chunked.counts, full.counts, rtol=1e-12)
+                    if weights is not None:
+                        np.testing.assert_array_equal(chunked.raw_counts, full.raw_counts)
+                full = psr_main.multi_binaries_result(
+                    self.df, self.b_names, self.qdcs_dic, self.qdc_strf, weights=weights)
+                chunked = tab.multi_binaries_result("binaries", "strf")
+                pd.testing.assert_frame_equal(chunked.number, full.number, rtol=1e-12)
+                pd.testing.assert_frame_equal(chunked.percentage, full.percentage, rtol=1e-12)
+
+    def sparse(self) -> None:
+        """Sparse count tables give the same tables as dense ones, and 
+        tables of observed labels are equal to pd.crosstab of decoded labels,
+        for a high-cardinality variable against stratification and a question.
+        """
+        rng = np.random.default_rng(1)
+        n_areas = 3000
+        df = self.df.assign(area=rng.integers(0, n_areas, len(self.df)).astype(float))
+        qdc_area = psr.QuestionDataContainer(
+            var_name="area", desc="Area", title="area", 
+            dic={ i : f"area{i:05d}" for i in range(n_areas)},
+            order=[ f"area{i:05d}" for i in range(n_areas)])
+        for qdc_row, qdc_col in [(qdc_area, self.qdc_strf), (self.qdcs_dic[self.q_names[0]], qdc_area)]:
+            ser_row = tabulation.decode_labels(df[qdc_row.var_name], qdc_row)
+            ser_col = tabulation.decode_labels(df[qdc_col.var_name], qdc_col)
+            dense = tabulation.count_crosstab(df, qdc_col, qdc_row, sparse=False)
+            sparse = tabulation.count_crosstab(df, qdc_col, qdc_row, sparse=True)
+            np.testing.assert_array_equal(tabulation.dense(sparse), dense)
+            for normalize, margins in itertools.product([False, "index", "columns", True], [False, True]):
+                expected = pd.crosstab(ser_row, ser_col, normalize=normalize, margins=margins)
+                for counts in [dense, sparse]:
+                    tab = tabulation.observed_crosstab(
+                        counts, qdc_row, qdc_col, normalize=normalize, margins=margins)
+                    pd.testing.assert_frame_equal(tab, expected, check_exact=True,
+                        check_index_type=False, check_column_type=False)
+            for percentage, skip_miss, margins in itertools.product([True, False], repeat=3):
+                pd.testing.assert_frame_equal(
+                    tabulation.crosstab_from_counts(
+                        sparse, qdc_col, qdc_row, percentage, skip_miss, margins),
+                    tabulation.crosstab_from_counts(
+                        dense, qdc_col, qdc_row, percentage, skip_miss, margins),
+                    check_exact=True)
+
+    def association(self) -> None:
+        """Statistics of association.association_matrix, by the dense and
+        the sparse product, agree with scipy.stats.chi2_contingency of 
+        pd.crosstab for each pair.
+        """
+        from scipy import stats
+        qdcs = [ self.qdcs_dic[v] for v in ["strf"] + self.q_names[:5] + self.b_names[:2]]
+        results = [association.association_matrix(self.df, qdcs)]
+        dense_cells = association.DENSE_CELLS
+        association.DENSE_CELLS = 0 # X.T @ X by scipy.sparse.
+        try:
+            results.append(association.association_matrix(self.df, qdcs))
+        finally:
+            association.DENSE_CELLS = dense_cells
+
+        for qdc_row, qdc_col in itertools.combinations(qdcs, 2):
+            row, col = qdc_row.var_name, qdc_col.var_name
+            tab = pd.crosstab(tabulation.decode_labels(self.df[row], qdc_row),
+                              tabulation.decode_labels(self.df[col], qdc_col))
+            chi2, p_value, dof, _ = stats.chi2_contingency(tab, correction=False)
+            n = tab.values.sum()
+            cramers_v = np.sqrt(chi2/(n*(min(tab.shape) - 1)))
+            for res in results:
+                observed = res.contingency(row, col).loc[tab.index, tab.columns]
+                np.testing.assert_array_equal(observed.values, tab.values)
+                assert res.n.loc[row, col] == n, (row, col)
+                assert res.dof.loc[row, col] == dof, (row, col)
+                np.testing.assert_allclose(
+                    [res.chi2.loc[row, col], res.p_value.loc[row, col], res.cramers_v.loc[row, col]],
+                    [chi2, p_value, cramers_v], rtol=1e-9, atol=1e-12, err_msg=f"{row}, {col}")
+
+CHECKS = ["render", "rollup", "shard", "chunked", "sparse", "association"]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--vars", type=int, default=8)
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=CHECKS)
+    args = parser.parse_args()
+
+    df, df_var = create_survey(n_rows=args.rows, n_vars=args.vars)
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checks = Checks(df, df_var, tmp_dir)
+        for name in args.checks:
+            try:
+                getattr(checks, name)()
+            except AssertionError as e:
+                print(f"{name:>12} FAILED {e}")
+                failed.append(name)
+                continue
+            print(f"{name:>12} ok")
+    if failed:
+        raise SystemExit(f"Results differ from straightforward paths: {failed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Synthetic survey data for benchmarks.
+
+Usage:
+    >>> from synthetic import create_survey
+    >>> df, df_var = create_survey(n_rows=100_000, n_vars=50, n_categories=5)
+"""
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+def create_item_str(n_categories : int, prefix : str = "cate") -> str:
+    """Item string like "1=cate1,2=cate2" read by utils.item_str2dict.
+    """
+    return(",".join(f"{i}={prefix}{i}" for i in range(1, n_categories + 1)))
+
+def create_codes(
+    rng : np.random.Generator,
+    n_rows : int,
+    n_categories : int,
+    missing_rate : float,
+) -> np.ndarray:
+    """Codes 1 to n_categories drawn with uneven probabilities.
+    NaN is inserted with missing_rate.
+    """
+    p = rng.dirichlet(np.ones(n_categories))
+    codes = rng.choice(np.arange(1, n_categories + 1), n_rows, p=p).astype(float)
+    codes[rng.random(n_rows) < missing_rate] = np.nan
+    return(codes)
+
+def create_survey(
+    n_rows : int = 10_000,
+    n_vars : int = 20,
+    n_categories : int = 5,
+    missing_rate : float = 0.05,
+    n_strata : int = 3,
+    n_binaries : int = 5,
+    seed : int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Create survey answers and its variable table.
+
+    Args:
+        n_rows : the number of respondents.
+        n_vars : the number of categorical questions "q0", "q1", ...
+        n_categories : the number of categories of each question.
+        missing_rate : rate of NaN in questions and stratification.
+        n_strata : the number of categories of stratification "strf".
+        n_binaries : the number of binary items "b0", "b1", ...
+        seed : random seed.
+
+    Returns:
+        DataFrame of answers and DataFrame with "var_name", "item" and "desc"
+        columns for question_data_containers_from_dataframe.
+    """
+    rng = np.random.default_rng(seed)
+    data = {"strf" : create_codes(rng, n_rows, n_strata, missing_rate)}
+    rows = [("strf", create_item_str(n_strata, "strata"), "Stratification")]
+    for i in range(n_vars):
+        data[f"q{i}"] = create_codes(rng, n_rows, n_categories, missing_rate)
+        rows.append((f"q{i}", create_item_str(n_categories), f"Question {i}"))
+    for i in range(n_binaries):
+        codes = (rng.random(n_rows) < rng.random()).astype(float)
+        codes[rng.random(n_rows) < missing_rate] = np.nan
+        data[f"b{i}"] = codes
+        rows.append((f"b{i}", "0=no,1=yes", f"Binary {i}"))
+    df = pd.DataFrame(data)
+    df_var = pd.DataFrame(rows, columns=["var_name", "item", "desc"])
+    return(df, df_var)
@@ -4,11 +4,37 @@ from .main import (
     output_multi_binaries_with_strat,
     question_data_containers_from_dataframe,
     heatmap_crosstab_from_df,
+    heatmap_association_from_df,
+    crosstab_result,
+    output_crosstab_result,
+    multi_binaries_result,
+    output_multi_binaries_result,
 )
 from .utils import (
     item_str2dict,
     imputate_reorder_table,
     delete_and_create_csv,
+    NumberWriter,
 )
-from .variables import QuestionDataContainer, VisVariables
+from .variables import (
+    QuestionDataContainer,
+    CompiledQuestionDataContainer,
+    NestedQuestionDataContainer,
+    VisVariables,
+)
+from .association import association_matrix, AssociationMatrix
+from .batch import ReportBatch
+from .stream import ChunkedTabulator
+from .render import ParallelRenderer, set_headless
+from .shard import ShardPool
+from .cache import ReportCache
+from .code_cache import CodeCache
 from .__version__ import __version__
+
+def __getattr__(name):
+    # vis_utils imports matplotlib, seaborn, cmocean and japanize_matplotlib,
+    # so it is imported when plotting is requested at first.
+    if name == "vis_utils":
+        import importlib
+        return(importlib.import_module(".vis_utils", __name__))
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
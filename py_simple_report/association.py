@@ -0,0 +1,169 @@
+from typing import Union, Optional, List, Dict, Tuple, Any
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from . import variables as vs
+from . import tabulation
+
+STATISTICS = ["cramers_v", "p_value", "chi2", "n"]
+# X.T @ X is multiplied as dense chunks of rows if the product has at most this
+# number of cells and the mean number of labels of qdcs is at most DENSE_LABELS.
+# BLAS is faster than the sparse product for a few labels for each qdc.
+DENSE_CELLS = 25_000_000
+DENSE_LABELS = 10
+CHUNK_ROWS = 4096
+
+def indicator_matrix(
+    df : pd.DataFrame,
+    qdcs : List[vs.QuestionDataContainer],
+    skip_miss : bool = False,
+) -> Tuple[Any, np.ndarray]:
+    """One-hot encode decoded labels of qdcs into one sparse indicator matrix.
+    Each qdc has a block of columns following "category_labels".
+    A row of a block is all zero for NaN and values not contained in labels,
+    so those rows are dropped pairwise like NaN in pd.crosstab. Requires scipy.
+
+    Args:
+        df : dataframe.
+        qdcs : qdcs to be encoded.
+        skip_miss : If True, missing of each qdc is dropped like NaN.
+
+    Returns:
+        scipy.sparse CSR matrix of shape (len(df), the number of all labels)
+        and offsets of blocks, whose last element is the number of all labels.
+    """
+    from scipy import sparse
+    sizes = [ len(tabulation.category_labels(qdc)) for qdc in qdcs]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    rows = []
+    cols = []
+    for qdc, offset, size in zip(qdcs, offsets, sizes):
+        pos = tabulation.decode_positions(df[qdc.var_name], qdc)
+        keep = (pos >= 0) & (pos < size)
+        if skip_miss and (qdc.compile().missing_pos >= 0):
+            keep &= (pos != qdc.compile().missing_pos)
+        rows.append(np.flatnonzero(keep))
+        cols.append(pos[keep].astype(np.int64) + offset)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    X = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(len(df), offsets[-1]))
+    return(X, offsets)
+
+def gram_matrix(X : Any, n_vars : int) -> Any:
+    """X.T @ X of an indicator matrix as scipy.sparse CSR matrix of counts.
+    """
+    from scipy import sparse
+    n_cols = X.shape[1]
+    if (n_cols*n_cols > DENSE_CELLS) or (n_cols > DENSE_LABELS*max(n_vars, 1)):
+        return((X.T @ X).tocsr())
+    # Counts are exact in float64 below 2**53.
+    product = np.zeros((n_cols, n_cols), dtype=np.float64)
+    for start in range(0, X.shape[0], CHUNK_ROWS):
+        chunk = X[start:start + CHUNK_ROWS].toarray().astype(np.float64)
+        product += chunk.T @ chunk
+    return(sparse.csr_matrix(product.astype(np.int64)))
+
+@dataclass
+class AssociationMatrix():
+    """Association of all pairs of qdcs. Statistics are DataFrames whose
+    index and columns are var_names. Only labels observed in each pair
+    are used, so a pair with fewer than two observed labels on either side has NaN.
+
+    Args:
+        qdcs : qdcs of rows and columns.
+        counts : scipy.sparse matrix of all contingency tables.
+            See "contingency" for each table.
+        offsets : offsets of blocks of labels in counts.
+        n : the number of rows where both of a pair are observed.
+        chi2 : Pearson's chi-square statistics without continuity correction.
+        dof : degrees of freedom.
+        p_value : p-values of chi-square tests.
+        cramers_v : Cramér's V.
+    """
+    qdcs : List[vs.QuestionDataContainer]
+    counts : Any
+    offsets : np.ndarray
+    n : pd.DataFrame
+    chi2 : pd.DataFrame
+    dof : pd.DataFrame
+    p_value : pd.DataFrame
+    cramers_v : pd.DataFrame
+
+    def contingency(self, var_row : str, var_col : str) -> pd.DataFrame:
+        """Contingency table of two var_names. Rows and columns follow
+        "category_labels", and labels which are not observed have 0.
+        """
+        names = [ qdc.var_name for qdc in self.qdcs]
+        i = names.index(var_row)
+        j = names.index(var_col)
+        values = self.counts[self.offsets[i]:self.offsets[i+1], self.offsets[j]:self.offsets[j+1]]
+        tab = pd.DataFrame(
+            tabulation.dense(values),
+            index=pd.Index(tabulation.category_labels(self.qdcs[i]), name=var_row),
+            columns=pd.Index(tabulation.category_labels(self.qdcs[j]), name=var_col),
+        )
+        return(tab)
+
+def association_matrix(
+    df : pd.DataFrame,
+    qdcs : List[vs.QuestionDataContainer],
+    skip_miss : bool = False,
+) -> AssociationMatrix:
+    """Chi-square tests and Cramér's V of all pairs of qdcs.
+    All contingency tables are obtained as blocks of one product X.T @ X
+    of the indicator matrix X (see "gram_matrix"), and statistics are 
+    calculated for all pairs at once by chi2 = n*(sum(O^2/(row_sum*col_sum)) - 1).
+    Requires scipy.
+
+    Args:
+        df : dataframe.
+        qdcs : qdcs to be compared.
+        skip_miss : If True, missing of each qdc is dropped like NaN.
+
+    Examples:
+        >>> res = association_matrix(df, [qdcs_dic[v] for v in var_names])
+        >>> res.cramers_v.loc["q1", "q2"]
+        >>> res.contingency("q1", "q2")
+    """
+    from scipy import sparse, stats
+    X, offsets = indicator_matrix(df, qdcs, skip_miss=skip_miss)
+    n_vars = len(qdcs)
+    var_of = np.repeat(np.arange(n_vars), np.diff(offsets))
+    B = sparse.csr_matrix(
+        (np.ones(len(var_of), dtype=np.int64), (np.arange(len(var_of)), var_of)),
+        shape=(len(var_of), n_vars))
+    counts = gram_matrix(X, n_vars)
+
+    # margins[a, j] : count of label a among rows where qdcs[j] is observed.
+    margins = tabulation.dense(counts @ B)
+    n = tabulation.dense(B.T @ margins)
+    coo = counts.tocoo()
+    a, b = coo.row, coo.col
+    q = coo.data.astype(np.float64)**2/(margins[a, var_of[b]]*margins[b, var_of[a]])
+    ratio = sparse.coo_matrix((q, (var_of[a], var_of[b])), shape=(n_vars, n_vars)).toarray()
+    # The number of labels observed in each pair. k[i, j] is for qdcs[i].
+    k = tabulation.dense(B.T @ (margins > 0).astype(np.int64))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi2 = np.where(n > 0, np.clip(n*(ratio - 1), 0, None), np.nan)
+        dof = (k - 1)*(k.T - 1)
+        m = np.minimum(k, k.T) - 1
+        cramers_v = np.where((n > 0) & (m > 0), np.sqrt(chi2/(n*m)), np.nan)
+        p_value = np.where(dof > 0, stats.chi2.sf(chi2, np.maximum(dof, 1)), np.nan)
+
+    names = pd.Index([ qdc.var_name for qdc in qdcs])
+    frame = lambda values: pd.DataFrame(values, index=names, columns=names)
+    res = AssociationMatrix(
+        qdcs = list(qdcs),
+        counts = counts,
+        offsets = offsets,
+        n = frame(n),
+        chi2 = frame(chi2),
+        dof = frame(dof),
+        p_value = frame(p_value),
+        cramers_v = frame(cramers_v),
+    )
+    return(res)
@@ -0,0 +1,222 @@
+from typing import Union, Optional, List, Dict, Tuple, Any, Iterable
+from collections import OrderedDict
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+from . import variables as vs
+from . import tabulation
+from . import stream
+from . import utils
+from . import render
+from . import main
+from .cache import ReportCache
+
+class ReportBatch():
+    def __init__(
+        self,
+        df : Optional[pd.DataFrame],
+        qdcs_dic : Dict[str, vs.QuestionDataContainer],
+        strata : List[Union[str, vs.QuestionDataContainer, List, Tuple]],
+        var_names : Optional[List[str]] = None,
+        skip_miss : bool = False,
+        percentage : bool = True,
+        include_all : bool = True,
+        weights : Optional[str] = None,
+    ) -> None:
+        """Cross-tabulate many question variables against the same stratifications.
+        Each column is decoded once, each raw count table is built once, and
+        number and percentage tables are derived from that count table.
+        Nested stratifications are counted at the finest combination once,
+        and coarser stratifications contained in it are rolled up from it.
+
+        Args:
+            df : DataFrame used for calculation. Can be None if tables
+                are created by "run_source".
+            qdcs_dic : qdcs for question variables and stratifications.
+            strata : var_names or qdcs for stratification. A list or tuple of them 
+                is a nested stratification. See tabulation.resolve_strata.
+            var_names : question variables. If None, all variables of qdcs_dic
+                except for strata are used.
+            skip_miss : If True, missing is ignored for percentage tables.
+            percentage : If True, percentage tables are output.
+            include_all : If True, "All" margins are added.
+            weights : a column name of weights. If given, tables are weighted
+                and unweighted number is also output.
+
+        Examples:
+            >>> batch = ReportBatch(df, qdcs_dic, strata=["sex", "age"])
+            >>> results = batch.run()
+            >>> tab_per = results["q1", "sex"].row_percentage
+            >>> batch = ReportBatch(df, qdcs_dic, strata=["sex", "age", ("sex", "age")])
+            >>> tab_per = batch.run()["q1", "sex-age"].row_percentage
+            >>> batch.output(save_fig_path="fig/{var_name}_{strf_name}.png",
+            >>>              save_num_path="number.csv", show=False)
+        """
+        self.df = df
+        self.qdcs_dic = qdcs_dic
+        self.strata = tabulation.resolve_strata(strata, qdcs_dic)
+        strf_names = [ q.var_name for qdc_strf in self.strata 
+                       for q in tabulation.strata_components(qdc_strf)]
+        if var_names is None:
+            var_names = [ v for v in qdcs_dic.keys() if v not in strf_names]
+        self.var_names = var_names
+        self.skip_miss = skip_miss
+        self.percentage = percentage
+        self.include_all = include_all
+        self.weights = weights
+        self.tables = OrderedDict()
+
+    def decode_all(self) -> Dict[int, np.ndarray]:
+        """Decode each used column once. Nested stratifications are
+        decoded as their qdcs.
+
+        Returns:
+            Keys are id of qdcs. Values are positions of labels in each order.
+        """
+        positions = {}
+        qdcs = [ self.qdcs_dic[v] for v in self.var_names]
+        for qdc_strf in self.strata:
+            qdcs += tabulation.strata_components(qdc_strf)
+        for qdc in qdcs:
+            if id(qdc) not in positions:
+                positions[id(qdc)] = tabulation.decode_positions(self.df[qdc.var_name], qdc)
+        return(positions)
+
+    def finest_strata(self) -> Dict[int, List[int]]:
+        """Group stratifications by the finest stratification containing them.
+
+        Returns:
+            Keys are indices of the finest stratifications in self.strata, and
+            values are indices of stratifications rolled up from them.
+        """
+        ids = [ { id(q) for q in tabulation.strata_components(qdc_strf)} 
+                for qdc_strf in self.strata]
+        groups = OrderedDict()
+        for i, c in enumerate(ids):
+            supersets = [ j for j, d in enumerate(ids) if c <= d]
+            base = max(supersets, key=lambda j: len(ids[j]))
+            groups.setdefault(base, []).append(i)
+        return(groups)
+
+    def run(self) -> Dict[Tuple[str, str], tabulation.CrosstabResult]:
+        """Count all pairs. Number and percentage tables are derived from 
+        each result.
+
+        Returns:
+            Keys are (var_name, var_name of stratification).
+        """
+        positions = self.decode_all()
+        w = tabulation.weights_array(self.df, self.weights)
+        counts = {}
+        raw_counts = {}
+        for base, members in self.finest_strata().items():
+            components = tabulation.strata_components(self.strata[base])
+            slots = [ tabulation.strata_slots(positions[id(q)], q) for q in components]
+            sizes = [ len(tabulation.category_labels(q)) + 2 for q in components]
+            pos_base = np.ravel_multi_index(slots, sizes)
+            for var_name in self.var_names:
+                qdc = self.qdcs_dic[var_name]
+                n = len(tabulation.category_labels(qdc)) + 1
+                joint = (tabulation.count_positions(pos_base, int(np.prod(sizes)), 
+                                                    positions[id(qdc)], n)
+                         .reshape(sizes + [n]))
+                w_joint = joint
+                if w is not None:
+                    w_joint = (tabulation.count_positions(pos_base, int(np.prod(sizes)), 
+                                                          positions[id(qdc)], n, weights=w)
+                               .reshape(sizes + [n]))
+                for i in members:
+                    counts[i, var_name] = tabulation.counts_from_joint(
+                        w_joint, components, self.strata[i])
+                    if w is not None:
+                        raw_counts[i, var_name] = tabulation.counts_from_joint(
+                            joint, components, self.strata[i])
+
+        self.tables = OrderedDict()
+        for i, qdc_strf in enumerate(self.strata):
+            for var_name in self.var_names:
+                self.tables[var_name, qdc_strf.var_name] = tabulation.CrosstabResult(
+                    self.qdcs_dic[var_name], qdc_strf, counts[i, var_name], 
+                    margins=self.include_all, raw_counts=raw_counts.get((i, var_name)))
+        return(self.tables)
+
+    def run_source(
+        self,
+        source : Union[str, Iterable[pd.DataFrame]],
+        chunksize : int = 100_000,
+        **read_kwgs,
+    ) -> Dict[Tuple[str, str], tabulation.CrosstabResult]:
+        """Count all pairs reading a CSV or Parquet file chunk by chunk 
+        instead of self.df. Only used columns are read. 
+        See stream.read_chunks for parameters.
+
+        Examples:
+            >>> batch = ReportBatch(None, qdcs_dic, strata=["sex", "age"])
+            >>> batch.run_source("survey.csv", chunksize=1_000_000)
+            >>> batch.output(save_num_path="number.csv", show=False)
+        """
+        tabulator = stream.ChunkedTabulator(
+            self.qdcs_dic, self.strata, var_names=self.var_names, 
+            include_all=self.include_all, weights=self.weights)
+        tabulator.update_from_source(source, chunksize=chunksize, **read_kwgs)
+        self.tables = tabulator.crosstab_results
+        return(self.tables)
+
+    def output(
+        self,
+        vis_var : Optional[vs.VisVariables] = None,
+        save_fig_path : Optional[str] = None,
+        save_num_path : Optional[Union[str, utils.NumberWriter]] = None,
+        show : Union[bool,str] = False,
+        decimal : int = 2,
+        stacked : bool = True,
+        transpose : bool = False,
+        n_workers : int = 1,
+        headless : Optional[bool] = None,
+        cache : Optional[ReportCache] = None,
+    ) -> None:
+        """Output all tables as "output_crosstab_cate_barplot" does.
+        If "run" has not been called yet, it is called here.
+
+        Args:
+            save_fig_path : format string of figure paths. "{var_name}" and
+                "{strf_name}" are replaced with each variable name.
+            save_num_path : all numbers are saved in this file through 
+                one utils.NumberWriter. Tables are appended to a csv file,
+                and an excel (.xlsx) file is overwritten.
+            n_workers : If larger than 1, figures are rendered by 
+                render.ParallelRenderer with this number of processes.
+            headless : If True, no figure is created when save_fig_path is None
+                and figures are not shown. See render.set_headless.
+            cache : If given, figures whose tables and vis_var are unchanged 
+                are restored from the cache. See cache.ReportCache.
+            Other parameters are passed to output_crosstab_result.
+        """
+        if not self.tables:
+            self.run()
+        show_figure = (show == True) or (show == "figure")
+        with contextlib.ExitStack() as stack:
+            if isinstance(save_num_path, str):
+                # An excel file is written from scratch since it can not be appended.
+                mode = "w" if utils.is_excel_path(save_num_path) else "a"
+                save_num_path = stack.enter_context(
+                    utils.NumberWriter(save_num_path, mode=mode))
+            renderer = None
+            if (n_workers > 1) and render.needs_figure(save_fig_path, show_figure, headless):
+                renderer = stack.enter_context(
+                    render.ParallelRenderer(n_workers=n_workers))
+
+            for (var_name, strf_name), result in self.tables.items():
+                if isinstance(save_fig_path, type(None)):
+                    path = None
+                else:
+                    path = save_fig_path.format(var_name=var_name, strf_name=strf_name)
+                main.output_crosstab_result(
+                    result, skip_miss=self.skip_miss, vis_var=vis_var,
+                    save_fig_path=path, save_num_path=save_num_path,
+                    percentage=self.percentage, show=show, decimal=decimal,
+                    stacked=stacked, transpose=transpose, renderer=renderer,
+                    headless=headless, cache=cache,
+                )
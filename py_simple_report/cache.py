@@ -0,0 +1,328 @@
+from typing import Union, Optional, List, Dict, Tuple, Any, Iterator
+import contextlib
+import filecmp
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .__version__ import __version__
+
+VERSION_FILE = "VERSION"
+COUNTS_FILE = "counts.npz"
+
+def update_hash(h : Any, obj : Any) -> None:
+    """Feed obj into hashlib object h. Data of pandas objects and numpy arrays
+    are hashed by their values, and objects by their public attributes.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(b"pandas")
+        update_hash(h, obj.shape)
+        update_hash(h, list(obj.index.names))
+        if isinstance(obj, pd.DataFrame):
+            update_hash(h, list(obj.columns))
+            update_hash(h, [ str(t) for t in obj.dtypes])
+        else:
+            update_hash(h, (obj.name, str(obj.dtype)))
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray) and (obj.dtype != object):
+        update_hash(h, (obj.shape, str(obj.dtype)))
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        update_hash(h, list(obj.items()))
+    elif isinstance(obj, (list, tuple, np.ndarray)):
+        h.update(f"{type(obj).__name__}{len(obj)}(".encode())
+        for v in obj:
+            update_hash(h, v)
+        h.update(b")")
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        update_hash(h, (type(obj).__qualname__, attributes(obj)))
+    else:
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+
+def attributes(obj : Any, exclude : Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Public attributes of obj sorted by name.
+    Class attributes of dataclasses are included.
+    """
+    names = set(getattr(obj, "__dataclass_fields__", {}).keys()) | set(vars(obj).keys())
+    return({ k : getattr(obj, k) for k in sorted(names)
+             if (not k.startswith("_")) and (k not in exclude)})
+
+def hash_key(*objs) -> str:
+    """Hex digest of objs. The library version is also hashed.
+    """
+    h = hashlib.sha256(__version__.encode())
+    for obj in objs:
+        update_hash(h, obj)
+    return(h.hexdigest())
+
+def column_fingerprint(ser : pd.Series) -> Tuple[Any, ...]:
+    """Cheap fingerprint of values of a column: the address of its buffer,
+    its length and dtype. Assigning new values to the column changes it,
+    but editing values in place does not.
+    """
+    values = ser.array
+    if isinstance(values, pd.Categorical):
+        values = values.codes
+    elif isinstance(ser.dtype, np.dtype):
+        values = ser.to_numpy(copy=False)
+    if isinstance(values, np.ndarray):
+        address = values.__array_interface__["data"][0]
+    else:
+        address = id(values)
+    return((address, len(ser), str(ser.dtype)))
+
+def hash_columns(
+    df : pd.DataFrame, 
+    columns : List[Optional[str]],
+    memo : Optional[Dict[Tuple[int, str], Any]] = None,
+) -> List[Any]:
+    """Hash values of columns of df. The index of df is not used.
+    None in columns is kept as it is.
+
+    Args:
+        memo : If given, hashes are stored in and reused from this dict
+            while column_fingerprint of each column is unchanged.
+    """
+    hashes = []
+    for col in columns:
+        if isinstance(col, type(None)):
+            hashes.append(None)
+            continue
+        ser = df[col]
+        if memo is not None:
+            fingerprint = column_fingerprint(ser)
+            entry = memo.get((id(df), col))
+            # df and ser are kept so that their ids and buffers are not reused.
+            if (entry is not None) and (entry[2] == fingerprint):
+                hashes.append(entry[3])
+                continue
+        value = (col, str(ser.dtype), pd.util.hash_pandas_object(ser, index=False).values)
+        if memo is not None:
+            memo[(id(df), col)] = (df, ser, fingerprint, value)
+        hashes.append(value)
+    return(hashes)
+
+def figure_paths(save_fig_path : Optional[str], variants : bool = False) -> Dict[str, str]:
+    """Paths of files written by a render job. Keys are roles of the files.
+    """
+    if not isinstance(save_fig_path, (str, os.PathLike)):
+        return({})
+    paths = {"figure" : save_fig_path}
+    if variants:
+        from .utils import PathOutput
+        path_out = PathOutput(str(save_fig_path))
+        paths["no_label"] = path_out.no_label
+        paths["label_only"] = path_out.label_only
+    return(paths)
+
+def file_stat(path : str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return(None)
+    return((stat.st_mtime_ns, stat.st_size))
+
+class ReportCache():
+    def __init__(
+        self,
+        directory : Union[str, os.PathLike],
+        max_bytes : Optional[int] = 1_000_000_000,
+    ) -> None:
+        """On-disk cache of count tables and rendered figures across reruns.
+        Entries are keyed by a hash of the used columns, fields of qdcs and
+        fields of VisVariables, so an entry is reused only when its inputs are
+        the same. The whole cache is cleared when the library version changes.
+
+        Args:
+            directory : directory for cache entries. Created if not exists.
+            max_bytes : If the total size of entries exceeds this size,
+                least recently used entries are deleted. If None,
+                entries are never deleted.
+
+        Examples:
+            >>> cache = ReportCache(".report_cache")
+            >>> for var_name in var_names:
+            >>>     output_crosstab_cate_barplot(df, qdcs_dic[var_name], qdc_strf,
+            >>>         save_fig_path=f"fig/{var_name}.png", show=False, cache=cache)
+            >>> cache.hits, cache.misses
+        """
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Hashes of columns memoized in "session". None out of sessions.
+        self.column_hashes = None
+        os.makedirs(self.directory, exist_ok=True)
+
+        version_path = os.path.join(self.directory, VERSION_FILE)
+        version = None
+        if os.path.exists(version_path):
+            with open(version_path) as f:
+                version = f.read().strip()
+        if version != __version__:
+            self.clear()
+            with open(version_path, "w") as f:
+                f.write(__version__)
+        self.sizes = { key : self.entry_size(key) for key in self.keys()}
+
+    def keys(self) -> List[str]:
+        return([ name for name in os.listdir(self.directory)
+                 if os.path.isdir(os.path.join(self.directory, name))
+                 and (not name.startswith("."))])
+
+    def entry_path(self, key : str) -> str:
+        return(os.path.join(self.directory, key))
+
+    def entry_size(self, key : str) -> int:
+        path = self.entry_path(key)
+        return(sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)))
+
+    @property
+    def total_bytes(self) -> int:
+        return(sum(self.sizes.values()))
+
+    def clear(self) -> None:
+        """Delete all entries.
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        self.sizes = {}
+
+    def lookup(self, key : str) -> Optional[str]:
+        """Return the directory of the entry and mark it as recently used.
+        """
+        path = self.entry_path(key)
+        with self.lock:
+            if not os.path.isdir(path):
+                self.misses += 1
+                return(None)
+            self.hits += 1
+            os.utime(path)
+        return(path)
+
+    def store(self, key : str, files : Dict[str, str]) -> None:
+        """Store files as one entry. Keys of files are file names in the entry
+        and values are paths of source files.
+        The entry is written into a temporary directory and renamed.
+        """
+        tmp = tempfile.mkdtemp(prefix=".tmp", dir=self.directory)
+        try:
+            for name, src in files.items():
+                shutil.copyfile(src, os.path.join(tmp, name))
+            with self.lock:
+                path = self.entry_path(key)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp, path)
+                self.sizes[key] = self.entry_size(key)
+                self.evict()
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the total size is below max_bytes.
+        """
+        if isinstance(self.max_bytes, type(None)):
+            return
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+        keys = sorted(self.sizes.keys(), key=lambda k: os.path.getmtime(self.entry_path(k)))
+        for key in keys:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            total -= self.sizes.pop(key)
+
+    def load_counts(self, key : str) -> Optional[List[np.ndarray]]:
+        """Load count tables stored by save_counts.
+        """
+        path = self.lookup(key)
+        if isinstance(path, type(None)):
+            return(None)
+        with np.load(os.path.join(path, COUNTS_FILE)) as data:
+            return([ data[f"arr_{i}"] for i in range(len(data.files))])
+
+    def save_counts(self, key : str, counts : List[np.ndarray]) -> None:
+        with tempfile.TemporaryDirectory(dir=self.directory, prefix=".tmp") as tmp:
+            src = os.path.join(tmp, COUNTS_FILE)
+            np.savez(src, *counts)
+            self.store(key, {COUNTS_FILE : src})
+
+    def restore_figure(self, key : str, paths : Dict[str, str]) -> bool:
+        """Copy cached figure files to paths. Files identical to cached ones
+        are not rewritten.
+
+        Returns:
+            True if the entry is found.
+        """
+        path = self.lookup(key)
+        if isinstance(path, type(None)):
+            return(False)
+        for role, dst in paths.items():
+            src = os.path.join(path, role + os.path.splitext(dst)[1])
+            if not os.path.exists(src):
+                continue
+            if os.path.exists(dst) and filecmp.cmp(src, dst, shallow=False):
+                continue
+            shutil.copyfile(src, dst)
+        return(True)
+
+    def save_figure(
+        self,
+        key : str,
+        paths : Dict[str, str],
+        stats : Dict[str, Optional[Tuple[int, int]]],
+    ) -> None:
+        """Store figure files written after stats were taken by file_stat.
+        """
+        files = {}
+        for role, dst in paths.items():
+            stat = file_stat(dst)
+            if (stat is not None) and (stat != stats.get(role)):
+                files[role + os.path.splitext(dst)[1]] = dst
+        if files:
+            self.store(key, files)
+
+    @contextlib.contextmanager
+    def session(self) -> Iterator["ReportCache"]:
+        """Hash each column once while the session is open. Otherwise
+        used columns are hashed for every table, e.g. the column of qdc_strf
+        for all var_names. Do not edit values of the DataFrame in place
+        in the session, since such edits are not detected.
+
+        Examples:
+            >>> with cache.session():
+            >>>     for var_name in var_names:
+            >>>         crosstab_result(df, qdcs_dic[var_name], qdc_strf, cache=cache)
+        """
+        if self.column_hashes is not None:
+            yield self
+            return
+        self.column_hashes = {}
+        try:
+            yield self
+        finally:
+            self.column_hashes = None
+
+    def table_key(self, df : pd.DataFrame, columns : List[Optional[str]], *objs) -> str:
+        """Key of a count table from used columns of df and objs such as qdcs.
+        """
+        return(hash_key("table", hash_columns(df, columns, memo=self.column_hashes), *objs))
+
+    def figure_key(self, job : Any) -> str:
+        """Key of a render.RenderJob. Paths and "show" of vis_var are not used,
+        so a figure is reused for other paths.
+        """
+        vis_var = attributes(job.vis_var, exclude=("save_fig_path", "show"))
+        ext = os.path.splitext(str(job.vis_var.save_fig_path))[1]
+        return(hash_key("figure", job.kind, job.tab, vis_var, job.options, ext))
@@ -0,0 +1,205 @@
+from typing import Union, Optional, List, Dict, Tuple, Any
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .__version__ import __version__
+
+MANIFEST_FILE = "manifest.json"
+
+def code_dtype(n_categories : int) -> np.dtype:
+    """Smallest signed integer dtype for codes 0 to n_categories-1 and -1 for NaN.
+    """
+    for dtype in [np.int8, np.int16, np.int32]:
+        if n_categories <= np.iinfo(dtype).max:
+            return(np.dtype(dtype))
+    return(np.dtype(np.int64))
+
+def to_json_value(v : Any) -> Any:
+    return(v.item() if isinstance(v, np.generic) else v)
+
+def encode_categories(column : str, categories : pd.Index) -> Dict[str, Any]:
+    """Categories as JSON values. Datetime and timedelta categories are 
+    written as strings with their dtype, and restored by "decode_categories".
+    """
+    if categories.dtype.kind in "mM":
+        return({"categories" : [ str(v) for v in categories], 
+                "categories_dtype" : str(categories.dtype)})
+    values = [ to_json_value(v) for v in categories]
+    for v in values:
+        if not isinstance(v, (str, int, float, bool)):
+            raise Exception(f"Values of {type(v).__name__} in {column} can not be cached")
+    return({"categories" : values})
+
+def decode_categories(entry : Dict[str, Any]) -> pd.Index:
+    categories = pd.Index(entry["categories"])
+    if "categories_dtype" in entry:
+        categories = categories.astype(entry["categories_dtype"])
+    return(categories)
+
+def categorical_from_codes(codes : np.ndarray, dtype : pd.CategoricalDtype) -> pd.Categorical:
+    """pd.Categorical.from_codes without validation of codes, which reads
+    all memory-mapped codes. pandas<2.1 always validates codes.
+    """
+    try:
+        return(pd.Categorical.from_codes(codes, dtype=dtype, validate=False))
+    except TypeError:
+        return(pd.Categorical.from_codes(codes, dtype=dtype))
+
+def source_signature(source : Union[str, os.PathLike]) -> List[Any]:
+    """Absolute path, modified time and size of a file.
+    """
+    stat = os.stat(source)
+    return([os.path.abspath(source), stat.st_mtime_ns, stat.st_size])
+
+class CodeCache():
+    def __init__(self, directory : Union[str, os.PathLike]) -> None:
+        """Open category codes written by "build". Each column is mapped into
+        memory with np.load(mmap_mode="r"), so processes opening the same
+        directory share pages through the OS cache.
+
+        Columns are stored as codes of their distinct values, and those values
+        are kept in the manifest. Since values are not replaced by labels,
+        a cache is valid even after "dic" or "order" of qdcs are edited, and
+        tabulation decodes only the distinct values.
+
+        Args:
+            directory : a directory written by "build".
+
+        Examples:
+            >>> cache = CodeCache.from_source("survey.csv", ".codes", list(qdcs_dic.keys()))
+            >>> df = cache.frame()
+            >>> output_crosstab_cate_barplot(df, qdcs_dic["q1"], qdcs_dic["sex"])
+        """
+        self.directory = os.fspath(directory)
+        with open(os.path.join(self.directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+
+    @property
+    def n_rows(self) -> int:
+        return(self.manifest["n_rows"])
+
+    @property
+    def columns(self) -> List[str]:
+        return(list(self.manifest["columns"].keys()))
+
+    @classmethod
+    def build(
+        cls,
+        df : pd.DataFrame,
+        directory : Union[str, os.PathLike],
+        columns : Optional[List[str]] = None,
+        source : Optional[List[Any]] = None,
+    ) -> "CodeCache":
+        """Write columns of df into directory. Numerical columns whose values are
+        not a few categories, like weights, are written as they are.
+
+        Args:
+            df : DataFrame of raw data.
+            directory : output directory. An existing cache is replaced.
+            columns : columns to be written. If None, all columns are written.
+                Typically var_names of qdcs_dic and a column of weights.
+            source : signature of the source file used by "from_source".
+        """
+        directory = os.path.abspath(os.fspath(directory))
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        if columns is None:
+            columns = list(df.columns)
+        # Files are written into a new directory which replaces the old one, 
+        # since processes may map files of the old cache into memory.
+        tmp = f"{directory}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp)
+        try:
+            entries = {}
+            for i, col in enumerate(columns):
+                ser = df[col]
+                # NaN is coded as -1 by default.
+                codes, categories = pd.factorize(ser, sort=True)
+                entry = {"file" : f"{i}.npy"}
+                if (len(categories) > np.iinfo(np.int16).max) and pd.api.types.is_numeric_dtype(ser.dtype):
+                    values = ser.to_numpy(dtype=np.float64, na_value=np.nan)
+                else:
+                    values = codes.astype(code_dtype(len(categories)))
+                    entry.update(encode_categories(col, categories))
+                np.save(os.path.join(tmp, entry["file"]), values)
+                entries[col] = entry
+
+            manifest = {"version" : __version__, "n_rows" : len(df),
+                        "source" : source, "columns" : entries}
+            with open(os.path.join(tmp, MANIFEST_FILE), "w") as f:
+                json.dump(manifest, f, indent=1)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        # A non-empty directory can not be replaced, so the old one is moved away.
+        # Files already mapped by other processes stay valid after removal.
+        old = None
+        if os.path.exists(directory):
+            old = f"{directory}.old-{uuid.uuid4().hex}"
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        return(cls(directory))
+
+    @classmethod
+    def from_source(
+        cls,
+        source : Union[str, os.PathLike],
+        directory : Union[str, os.PathLike],
+        columns : List[str],
+        **read_kwgs,
+    ) -> "CodeCache":
+        """Open the cache of a CSV or Parquet file. The file is read and the cache
+        is written only if the file, columns or the library version are changed.
+
+        Args:
+            source : a path of CSV or Parquet file.
+            directory : a directory of the cache.
+            columns : columns to be cached.
+            read_kwgs : keyword arguments passed to pd.read_csv.
+        """
+        signature = source_signature(source)
+        try:
+            cache = cls(directory)
+        except (OSError, ValueError):
+            cache = None
+        if ((cache is not None) and (cache.manifest["version"] == __version__)
+            and (cache.manifest["source"] == signature) and (set(columns) <= set(cache.columns))):
+            return(cache)
+
+        from .stream import PARQUET_EXTENSIONS
+        if str(source).lower().endswith(PARQUET_EXTENSIONS):
+            df = pd.read_parquet(source, columns=columns)
+        else:
+            df = pd.read_csv(source, usecols=columns, **read_kwgs)
+        return(cls.build(df, directory, columns, source=signature))
+
+    def codes(self, column : str) -> np.ndarray:
+        """Memory-mapped codes (or values) of a column.
+        """
+        entry = self.manifest["columns"][column]
+        return(np.load(os.path.join(self.directory, entry["file"]), mmap_mode="r"))
+
+    def series(self, column : str) -> pd.Series:
+        """A column as a categorical series on the memory-mapped codes.
+        """
+        entry = self.manifest["columns"][column]
+        values = self.codes(column)
+        if "categories" in entry:
+            values = categorical_from_codes(
+                values, pd.CategoricalDtype(decode_categories(entry)))
+        return(pd.Series(values, name=column, copy=False))
+
+    def frame(self, columns : Optional[List[str]] = None) -> pd.DataFrame:
+        """DataFrame of cached columns, which can be passed to tabulation
+        and output functions instead of raw data.
+        """
+        if columns is None:
+            columns = self.columns
+        return(pd.DataFrame({ col : self.series(col) for col in columns}, copy=False))
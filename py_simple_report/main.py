@@ -5,12 +5,15 @@ import copy
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import japanize_matplotlib
 
 from . import variables as vs
 from . import utils
-from . import vis_utils
+from . import tabulation
+from . import association
+from . import render
+from . import shard
+from . import stream
+from .cache import ReportCache
 
 def create_one_question_data_container(
     var_name: str, 
@@ -35,7 +38,7 @@ def create_one_question_data_container(
     qdc = vs.QuestionDataContainer(
         var_name = var_name, 
         dic   = dic, 
-        order = dic.values(), 
+        order = list(dic.values()), 
         desc  = desc,
         title = f"{var_name}_{desc}",
         missing=missing 
@@ -91,6 +94,8 @@ def heatmap_crosstab_from_df(
     skip_all : bool = False, 
     show : bool = True,
     vis_var : Optional[vs.VisVariables] = None,
+    renderer : Optional[render.ParallelRenderer] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Create crosstab heatmap from dataframe. 
 
@@ -108,6 +113,8 @@ def heatmap_crosstab_from_df(
         show : If False, figure is not plotted.
         vis_var : Although title, xlabel, and ylabel are contained in vis_var,
             vis_var is given priority to the above parameters.
+        renderer : If given, the figure is rendered in its worker processes.
+        cache : If given, a cached figure is restored instead of rendering.
 
     Note:
         If vis_var is None, the following code is run.
@@ -120,21 +127,21 @@ def heatmap_crosstab_from_df(
         >>>     vis_var.title = f"{qdc_row.var_name},{qdc_col.var_name},cnt"
         >>>     vis_var.annotate_fmt = ".0f"
     """
-    dfM = df.copy()
-    dfM[qdc_row.var_name] = dfM[qdc_row.var_name].replace(qdc_row.dic)
-    dfM[qdc_col.var_name] = dfM[qdc_col.var_name].replace(qdc_col.dic)
-    order_row = list(qdc_row.order)
-    order_col = list(qdc_col.order)
-    ser_row = dfM[qdc_row.var_name]
-    ser_col = dfM[qdc_col.var_name]
+    order_row = list(qdc_row.compile().order)
+    order_col = list(qdc_col.compile().order)
+    margins = (False if skip_all else True) if normalize is not None else False
+    # Counted on label positions, which is sparse for high cardinality. 
+    counts = tabulation.count_crosstab(df, qdc_col, qdc_row, sparse=None)
+    tab = tabulation.observed_crosstab(counts, qdc_row, qdc_col, 
+                                       normalize=False if normalize is None else normalize, 
+                                       margins=margins)
+    if tab is None:
+        ser_row = tabulation.decode_labels(df[qdc_row.var_name], qdc_row)
+        ser_col = tabulation.decode_labels(df[qdc_col.var_name], qdc_col)
+        tab = pd.crosstab(ser_row, ser_col, normalize=False if normalize is None else normalize, 
+                          margins=margins)
     if normalize is not None:
-        margins = False if skip_all else True
-        tab= (pd.crosstab(ser_row, ser_col, normalize=normalize, margins=margins)
-                   .mul(100)
-                   .round(2)
-                  )
-    else:
-        tab     = pd.crosstab(ser_row, ser_col, normalize=False, margins=False)
+        tab = tab.mul(100).round(2)
     tab = utils.imputate_reorder_table(tab, rows_=order_row, cols_=order_col)
 
     if vis_var is None:
@@ -151,7 +158,65 @@ def heatmap_crosstab_from_df(
     vis_var.save_fig_path = save_fig_path if vis_var.save_fig_path is None else vis_var.save_fig_path
 
     vis_var.show = vis_var.show if vis_var.show == False else show
-    vis_utils.heatmap_crosstab(tab, fontsize=fontsize, vis_var=vis_var)
+    job = render.RenderJob("heatmap_crosstab", tab, vis_var, dict(fontsize=fontsize))
+    render.submit_job(job, renderer, cache)
+
+def heatmap_association_from_df(
+    df : pd.DataFrame,
+    qdcs : List[vs.QuestionDataContainer],
+    stat : str = "cramers_v",
+    skip_miss : bool = False,
+    fontsize : float = 8,
+    title : Optional[str] = None,
+    save_fig_path : Optional[str] = None,
+    show : bool = True,
+    vis_var : Optional[vs.VisVariables] = None,
+    renderer : Optional[render.ParallelRenderer] = None,
+    cache : Optional[ReportCache] = None,
+) -> association.AssociationMatrix:
+    """Create a heatmap of association between all pairs of qdcs 
+    for screening. See association.association_matrix. Requires scipy.
+
+    Args:
+        df : dataframe.
+        qdcs : qdcs to be compared. 
+        stat : Takes "cramers_v", "p_value", "chi2" or "n".
+        skip_miss : If True, missing of each qdc is dropped like NaN.
+        title : title.
+        save_fig_path : to save file path.
+        show : If False, figure is not plotted.
+        vis_var : If given, used instead of the default below.
+        renderer : If given, the figure is rendered in its worker processes.
+        cache : If given, a cached figure is restored instead of rendering.
+
+    Returns:
+        AssociationMatrix holding all statistics and contingency tables.
+
+    Note:
+        If vis_var is None, the following code is run.
+        Values are annotated only for 20 or fewer qdcs.
+
+        >>> size = max(4, 0.2*len(qdcs) + 1)
+        >>> vis_var = vs.VisVariables( xrotation=90, figsize=(size + 1, size), cmap_name="haline",
+        >>>                            annotate=len(qdcs) <= 20, annotate_fmt=".2f")
+        >>> vis_var.title = stat
+    """
+    if stat not in association.STATISTICS:
+        raise Exception(f"stat takes one of {association.STATISTICS}")
+    res = association.association_matrix(df, qdcs, skip_miss=skip_miss)
+    tab = getattr(res, stat)
+
+    if vis_var is None:
+        size = max(4, 0.2*len(qdcs) + 1)
+        vis_var = vs.VisVariables( xrotation=90, figsize=(size + 1, size), cmap_name="haline",
+                                   annotate=len(qdcs) <= 20, annotate_fmt=".2f")
+        vis_var.title = stat if title is None else title
+    vis_var.save_fig_path = save_fig_path if vis_var.save_fig_path is None else vis_var.save_fig_path
+
+    vis_var.show = vis_var.show if vis_var.show == False else show
+    job = render.RenderJob("heatmap_crosstab", tab, vis_var, dict(fontsize=fontsize))
+    render.submit_job(job, renderer, cache)
+    return(res)
 
 def one_cate_bar_data(
     df : pd.DataFrame,
@@ -159,15 +224,34 @@ def one_cate_bar_data(
     percentage : bool = False,
     order : Optional[list] = None,
     skip_miss : bool = False,
+    weights : Optional[str] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
 ) -> pd.Series:
     """Obtain summarized data for barplot. 
     1. Value_counts of a specific column. 
     2. Reorder index according to "order" parameters.
     3. Skip missing variables or not. 
     4. Adjsut percentage as 100% or not.
+
+    Args:
+        weights : a column name of weights. If given, weights are summed up
+            instead of counting rows. Only the weighted table is returned,
+            so call this function without weights for unweighted numbers.
+        n_workers : If not 1, rows are split into shards counted in this number 
+            of processes. A shard.ShardPool can be given to reuse its processes
+            and written columns. Weighted counts can differ from those of 
+            one process in the last bits. See shard.sharded_counts.
     """
-    ser = df[qdc.var_name].replace(qdc.dic)
-    tab = ser.value_counts()
+    labels = tabulation.category_labels(qdc)
+    counts = shard.sharded_counts(df, [qdc.var_name, weights], tabulation.count_categories,
+                                  qdc, weights=weights, with_raw=True, n_workers=n_workers)
+    raw_counts, counts = counts if weights is not None else (counts, counts)
+    if raw_counts[len(labels)] > 0:
+        raise Exception(f"Values other than {labels} are found in {qdc.var_name}")
+    observed = raw_counts[:len(labels)] > 0
+    tab = pd.Series(counts[:len(labels)], 
+                    index=pd.Index(labels, name=qdc.var_name), name="count")
+    tab = tab[observed]
     
     if not order:
         order = qdc.order
@@ -190,16 +274,20 @@ def one_cate_bar_plot(
     qdc : vs.QuestionDataContainer,
     vis_var : vs.VisVariables,
     percentage : bool = False,
+    renderer : Optional[render.ParallelRenderer] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Plotting bar plot for one categorical variable.
+    If renderer is given, the figure is rendered in its worker processes.
+    If cache is given, a cached figure is restored instead of rendering.
     """
     if not vis_var.title:
         vis_var.title = qdc.title
     if not vis_var.ylabel:
         vis_var.ylabel = vis_var.label_count if not percentage else vis_var.label_cont 
 
-    vis = vis_utils.SingleVis(vis_var=vis_var)
-    vis.one_cate_bar_plot(tab)
+    job = render.RenderJob("one_cate_bar_plot", tab, vis_var)
+    render.submit_job(job, renderer, cache)
 
 def crosstab_data(
     df : pd.DataFrame,
@@ -208,6 +296,8 @@ def crosstab_data(
     percentage : bool = True,
     skip_miss : bool = False,
     crosstab_kwgs : Optional[Dict[str, Any]] = None,  
+    weights : Optional[str] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
 ) -> pd.DataFrame:
     """Crosstabulation of data given original dataframe, qdc and qdc_strf.
     Percentage and skip_miss are adjusted by parameters. 
@@ -220,14 +310,40 @@ def crosstab_data(
     Args:
         corsstab_kwgs : a dictionary passed to pd.crosstab. 
             The "percentage" parameter edit this dictionary. 
+            If only "margins" is given, decoded category codes are counted 
+            without pd.crosstab, as scipy.sparse matrix for high cardinality 
+            (see tabulation.count_crosstab).
+        weights : a column name of weights. If given, weights are summed up
+            instead of counting rows. Only "margins" can be given to crosstab_kwgs.
+            Only the weighted table is returned. Use "crosstab_result" to keep 
+            unweighted numbers alongside as CrosstabResult.raw_number.
+        n_workers : If not 1, rows are split into shards counted in this number 
+            of processes. A shard.ShardPool can be given to reuse its processes
+            and written columns. Weighted counts can differ from those of 
+            one process in the last bits. See shard.sharded_counts. Only "margins" can be given 
+            to crosstab_kwgs.
     """
     
     if isinstance(crosstab_kwgs, type(None)):
         crosstab_kwgs = {}
+    if (not set(crosstab_kwgs.keys()) <= {"margins"}):
+        if not isinstance(weights, type(None)):
+            raise Exception("weights can be used only with 'margins' of crosstab_kwgs")
+        if n_workers != 1:
+            raise Exception("n_workers can be used only with 'margins' of crosstab_kwgs")
+    if set(crosstab_kwgs.keys()) <= {"margins"}:
+        columns = [qdc.var_name, weights]
+        columns += [ q.var_name for q in tabulation.strata_components(qdc_strf)]
+        counts = shard.sharded_counts(df, columns, tabulation.count_crosstab, qdc, qdc_strf, 
+                                      weights=weights, sparse=None, n_workers=n_workers)
+        tab = tabulation.crosstab_from_counts(
+            counts, qdc, qdc_strf, percentage=percentage, skip_miss=skip_miss,
+            margins=crosstab_kwgs.get("margins", False))
+        return tab
         
     # cross tabulation.
-    ser = df[qdc.var_name].replace(qdc.dic)
-    ser_strf = df[qdc_strf.var_name].replace(qdc_strf.dic)
+    ser = tabulation.decode_labels(df[qdc.var_name], qdc)
+    ser_strf = tabulation.decode_labels(df[qdc_strf.var_name], qdc_strf)
     if skip_miss:
         ser = ser[~(ser==qdc.missing)] 
     if percentage:
@@ -253,8 +369,15 @@ def crosstab_cate_barplot(
     percentage : bool = False,
     legend : bool = True,
     transpose : bool = False,
+    variants : bool = False,
+    renderer : Optional[render.ParallelRenderer] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Plot crosstabulational data.
+    If variants is True, a figure without legend and a legend only figure 
+    are also saved. If renderer is given, the figure is rendered in its 
+    worker processes. If cache is given, cached figures are restored 
+    instead of rendering.
     """
     if isinstance(vis_var.title, type(None)):
         vis_var.title = qdc.title[:15]
@@ -264,18 +387,27 @@ def crosstab_cate_barplot(
         if not vis_var.ylim:
             vis_var.ylim = [0,100]
 
-    vis_var = vis_utils.obtain_cmap4labels(qdc.order, qdc.missing, vis_var)
-    vis = vis_utils.SingleVis(vis_var=vis_var)
-    vis.crosstab_cate_barplot(tab, legend=legend, percentage=percentage)
+    from . import vis_utils
+    vis_var = vis_utils.obtain_cmap4labels(qdc.compile().order, qdc.missing, vis_var)
+    job = render.RenderJob("crosstab_cate_barplot", tab, vis_var, 
+                           dict(legend=legend, percentage=percentage, variants=variants))
+    render.submit_job(job, renderer, cache)
 
 def crosstab_cate_stacked_barplot(
     tab : pd.Series,
     qdc : vs.QuestionDataContainer,
     vis_var : vs.VisVariables,
     percentage : bool = False,
-    legend : bool = True
+    legend : bool = True,
+    variants : bool = False,
+    renderer : Optional[render.ParallelRenderer] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Plot crosstabulational data.
+    If variants is True, a figure without legend and a legend only figure 
+    are also saved. If renderer is given, the figure is rendered in its 
+    worker processes. If cache is given, cached figures are restored 
+    instead of rendering.
     """
     if isinstance(vis_var.title, type(None)):
         vis_var.title = qdc.title[:15]
@@ -285,105 +417,215 @@ def crosstab_cate_stacked_barplot(
         if not vis_var.xlim:
             vis_var.xlim = [0,100]
 
-    vis_var = vis_utils.obtain_cmap4labels(qdc.order, qdc.missing, vis_var)
-    vis = vis_utils.SingleVis(vis_var=vis_var)
+    from . import vis_utils
+    vis_var = vis_utils.obtain_cmap4labels(qdc.compile().order, qdc.missing, vis_var)
     tab = tab.loc[tab.index[::-1]]
-    vis.crosstab_cate_stacked_barplot(tab, legend=legend, percentage=percentage)
+    job = render.RenderJob("crosstab_cate_stacked_barplot", tab, vis_var, 
+                           dict(legend=legend, percentage=percentage, variants=variants))
+    render.submit_job(job, renderer, cache)
 
 def output_crosstab_cate_barplot(
-    df : pd.DataFrame,
+    df : Union[pd.DataFrame, stream.ChunkedTabulator],
     qdc : vs.QuestionDataContainer,
     qdc_strf : vs.QuestionDataContainer,
     skip_miss : bool = False,
     vis_var : Optional[vs.VisVariables] = None,
     save_fig_path : Optional[str] = None,
-    save_num_path : Optional[str] = None,
+    save_num_path : Optional[Union[str, utils.NumberWriter]] = None,
     percentage : bool = True,
     include_all : bool = True,
     show : Union[bool,str] = True,
     decimal : int = 2,
     stacked : bool = True,
     transpose : bool = False,
+    renderer : Optional[render.ParallelRenderer] = None,
+    headless : Optional[bool] = None,
+    weights : Optional[str] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Output cross-tabulated data as number/percentage and a figure.
 
     Args:
-        df : DataFrame used for calculation.
+        df : DataFrame used for calculation, or stream.ChunkedTabulator
+            which holds counts of qdc and qdc_strf. Saved counts can be 
+            updated only with new rows. See stream.ChunkedTabulator.load.
+            An exception is raised if qdc or qdc_strf differs from 
+            that of the tabulator.
         qdc : Can include missing.
         qdc_strf : For stratification. Can not include missing for this qdc.
         skip_miss : If True, missing of rows is ignored and percentage is calculated without missing.
         vis_var : For control of visualization. See vs.VisVariables for more detail.
         save_fig_path : Path for saving fig.
-        save_num_path : Path for saving numbers/percentages.
+        save_num_path : Path for saving numbers/percentages, or utils.NumberWriter.
         percentage : If True, a figure is created as a percentage style.
         include_all : If True, margins in pd.crosstab set True for number and percentage.
         show : Takes True, False, "number", "figure".
         decimal : Round to "decimal"th place when exporting a percentage.
         transpose : transpose dataframe.
+        renderer : If given, figures are rendered in its worker processes.
+            See render.ParallelRenderer.
+        headless : If True, no figure is created when save_fig_path is None and 
+            figures are not shown. If None, the global setting is used. 
+            See render.set_headless.
+        weights : a column name of weights. If given, weighted number and
+            percentage are output with unweighted number.
+        cache : If given, count tables and figures are reused from the cache 
+            when their inputs are unchanged. See cache.ReportCache.
+    """
+    if isinstance(df, stream.ChunkedTabulator):
+        if (not isinstance(weights, type(None))) and (weights != df.weights):
+            raise Exception(f"Counts are tabulated with weights={df.weights}")
+        df.check_qdcs([qdc, qdc_strf])
+        result = df.crosstab_result(qdc.var_name, qdc_strf.var_name, include_all=include_all)
+    else:
+        result = crosstab_result(df, qdc, qdc_strf, include_all=include_all, 
+                                 weights=weights, cache=cache)
+    output_crosstab_result(
+        result, skip_miss=skip_miss, vis_var=vis_var,
+        save_fig_path=save_fig_path, save_num_path=save_num_path, 
+        percentage=percentage, show=show, decimal=decimal, 
+        stacked=stacked, transpose=transpose, renderer=renderer, cache=cache,
+        headless=headless,
+    )
+
+def crosstab_counts(
+    df : pd.DataFrame,
+    qdc : vs.QuestionDataContainer,
+    qdc_strf : vs.QuestionDataContainer,
+    weights : Optional[str] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
+) -> List[np.ndarray]:
+    """Count table for crosstab_result. If weights is given, 
+    a weighted count table follows the unweighted one.
+    """
+    columns = [qdc.var_name, weights]
+    columns += [ q.var_name for q in tabulation.strata_components(qdc_strf)]
+    # Unweighted and weighted tables are counted in one pass.
+    counts = shard.sharded_counts(df, columns, tabulation.count_crosstab, qdc, qdc_strf,
+                                  weights=weights, with_raw=True, n_workers=n_workers)
+    return([counts] if isinstance(weights, type(None)) else list(counts))
+
+def crosstab_result(
+    df : pd.DataFrame,
+    qdc : vs.QuestionDataContainer,
+    qdc_strf : vs.QuestionDataContainer,
+    include_all : bool = True,
+    weights : Optional[str] = None,
+    cache : Optional[ReportCache] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
+) -> tabulation.CrosstabResult:
+    """Cross tabulate data once. Number and percentage tables are
+    derived from the returned object.
+
+    Args:
+        df : DataFrame used for calculation.
+        qdc : a qdc for columns.
+        qdc_strf : a qdc for stratification.
+        include_all : If True, "All" margins are added to tables.
+        weights : a column name of weights. If given, tables are weighted and
+            unweighted number is kept as "raw_number".
+        cache : If given, count tables are loaded from the cache when 
+            the used columns and qdcs are unchanged. See cache.ReportCache.
+        n_workers : If not 1, rows are split into shards counted in this number 
+            of processes. A shard.ShardPool can be given to reuse its processes
+            and written columns. Weighted counts can differ from those of 
+            one process in the last bits. See shard.sharded_counts.
     """
-    if include_all:
-        crosstab_kwgs = dict(margins=True)
+    if isinstance(cache, type(None)):
+        counts = crosstab_counts(df, qdc, qdc_strf, weights, n_workers)
     else:
-        crosstab_kwgs = dict(margins=False)
-    tab = crosstab_data(df, qdc, qdc_strf, percentage=False, skip_miss=False, 
-                        crosstab_kwgs=crosstab_kwgs)
-    tab_per  = crosstab_data(df, qdc, qdc_strf, percentage=percentage, skip_miss=skip_miss,
-                         crosstab_kwgs=crosstab_kwgs)
+        columns = [qdc.var_name, weights]
+        columns += [ q.var_name for q in tabulation.strata_components(qdc_strf)]
+        key = cache.table_key(df, columns, "crosstab", qdc, qdc_strf)
+        counts = cache.load_counts(key)
+        if isinstance(counts, type(None)):
+            counts = crosstab_counts(df, qdc, qdc_strf, weights, n_workers)
+            cache.save_counts(key, counts)
+
+    if isinstance(weights, type(None)):
+        return(tabulation.CrosstabResult(qdc, qdc_strf, counts[0], margins=include_all))
+    return(tabulation.CrosstabResult(
+        qdc, qdc_strf, counts[1], margins=include_all, raw_counts=counts[0]))
+
+def output_crosstab_result(
+    result : tabulation.CrosstabResult,
+    skip_miss : bool = False,
+    vis_var : Optional[vs.VisVariables] = None,
+    save_fig_path : Optional[str] = None,
+    save_num_path : Optional[Union[str, utils.NumberWriter]] = None,
+    percentage : bool = True,
+    show : Union[bool,str] = True,
+    decimal : int = 2,
+    stacked : bool = True,
+    transpose : bool = False,
+    renderer : Optional[render.ParallelRenderer] = None,
+    headless : Optional[bool] = None,
+    cache : Optional[ReportCache] = None,
+) -> None:
+    """Output already cross-tabulated data as number/percentage and a figure.
+    See output_crosstab_cate_barplot for parameters.
+
+    Args:
+        result : a result created by crosstab_result.
+    """
+    qdc = result.qdc
+    qdc_strf = result.qdc_strf
+    tab = result.number
+    tab_per = result.table(percentage=percentage, skip_miss=skip_miss)
+    tab_raw = result.raw_number
     if transpose:
         tab = tab.T
         tab_per = tab_per.T
+        tab_raw = tab_raw.T if tab_raw is not None else None
 
     # Number part.
     if (show == True) or (show == "number"):
+        if tab_raw is not None:
+            display(tab_raw)
         display(tab)
         display(tab_per)
     if not isinstance(save_num_path, type(None)):
         pre_title = f"{qdc.title}" 
-        utils.save_number_to_data(tab, save_num_path, title=f"{pre_title} raw number")
+        if tab_raw is None:
+            utils.save_number_to_data(tab, save_num_path, title=f"{pre_title} raw number",
+                                      sheet_name=qdc.var_name)
+        else:
+            utils.save_number_to_data(tab_raw, save_num_path, title=f"{pre_title} raw number",
+                                      sheet_name=qdc.var_name)
+            utils.save_number_to_data(tab, save_num_path, title=f"{pre_title} weighted number",
+                                      decimal=decimal, sheet_name=qdc.var_name)
         if skip_miss:
             title = f"{pre_title} percentage(%) excluding missing"
         else:
             title = f"{pre_title} percentage(%) including missing"
         utils.save_number_to_data(
-            tab_per, save_num_path, title=title, decimal=decimal)
+            tab_per, save_num_path, title=title, decimal=decimal, sheet_name=qdc.var_name)
 
+    show_figure = (show == True) or (show == "figure")
+    if not render.needs_figure(save_fig_path, show_figure, headless):
+        return
     if isinstance(vis_var, type(None)):
         vis_var = vs.VisVariables()
     else:
         vis_var = copy.deepcopy(vis_var)
 
     # Visualization part.
-    if isinstance(vis_var, type(None)):
-        vis_var = vs.VisVariables()
-    if (show == True) or (show == "figure"):
-        vis_var.show = True
-    else:
-        vis_var.show = False
+    vis_var.show = show_figure
     tab = tab_per if percentage else tab
     qdc = qdc if not transpose else qdc_strf
-    path_output = utils.PathOutput(save_fig_path)
     # Since "All" should not be included here, delete "All" index and columns.
     tab = utils.delete_All_from_index_column(tab)
 
-    vis_var.save_fig_path = path_output.raw
-    if stacked:
-        crosstab_cate_stacked_barplot(tab, qdc, vis_var, 
-                                   percentage=percentage, legend=True)
-    else:
-        crosstab_cate_barplot(tab, qdc, vis_var, 
-                                   percentage=percentage, legend=True)
-
-    vis_var.save_fig_path = path_output.no_label
+    # A figure without legend and a legend only figure are saved from one figure.
+    vis_var.save_fig_path = save_fig_path
     if stacked:
         crosstab_cate_stacked_barplot(tab, qdc, vis_var, 
-                                   percentage=percentage, legend=False)
+                                   percentage=percentage, legend=True, variants=True,
+                                   renderer=renderer, cache=cache)
     else:
         crosstab_cate_barplot(tab, qdc, vis_var, 
-                                   percentage=percentage, legend=False)
-
-    # Create label only
-    vis_var.save_fig_path = path_output.label_only
-    vis_utils.label_only_fig(vis_var, tab, qdc.missing)
+                                   percentage=percentage, legend=True, variants=True,
+                                   renderer=renderer, cache=cache)
 
 def obtain_multi_binaries_items_with_strat(
     df : pd.DataFrame,
@@ -392,42 +634,95 @@ def obtain_multi_binaries_items_with_strat(
     qdc_strf : vs.QuestionDataContainer, 
     percentage : bool = True,
     fetch_value : Any = 1,
-    crosstab_kwgs : Optional[Dict[str, Any]] = None
+    crosstab_kwgs : Optional[Dict[str, Any]] = None,
+    weights : Optional[str] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
 ) -> pd.DataFrame:
     """Calculate percentage of yes for multiple binary question items.
     
     Args : 
         q_var_names: multiple binary question items for crosstabulation.
         fetch_value : a value for flag yes.
+        weights : a column name of weights. If given, weights are summed up
+            instead of counting rows.
+        n_workers : If not 1, rows are split into shards counted in this number 
+            of processes. A shard.ShardPool can be given to reuse its processes
+            and written columns. Weighted counts can differ from those of 
+            one process in the last bits. See shard.sharded_counts.
     """
-    dfM = df.copy()
-    dfM[q_var_names] = dfM[q_var_names].replace(np.nan,0)
-    ser_strf = df[qdc_strf.var_name].replace(qdc_strf.dic)
-    df_sum = pd.DataFrame()
-    for l in q_var_names:
-        # Create label. 
-        qdc = qdcs_dic[l]
-        label = qdc.dic[fetch_value] # Fetch "1" value.
-
-        # Crosstabulate data.
-        if percentage:
-            tab = (pd.crosstab(ser_strf, dfM[l], normalize="index")
-                   .mul(100)
-                   )
-        else:
-            tab = pd.crosstab(ser_strf, dfM[l])
-        per = tab[fetch_value].rename(label) # Fetch "1" value.
-        df_sum = pd.concat((df_sum, per), axis=1)
-    df_sum = df_sum.loc[qdc_strf.order]
+    result = multi_binaries_result(df, q_var_names, qdcs_dic, qdc_strf, fetch_value,
+                                   weights=weights, n_workers=n_workers)
+    df_sum = result.percentage if percentage else result.number
     return(df_sum)
 
+def multi_binaries_counts(
+    df : pd.DataFrame,
+    q_var_names : List[str],
+    qdc_strf : vs.QuestionDataContainer, 
+    fetch_value : Any = 1,
+    weights : Optional[str] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
+) -> List[np.ndarray]:
+    """Count tables and sizes for multi_binaries_result. If weights is given,
+    weighted ones follow the unweighted ones.
+    """
+    columns = list(q_var_names) + [weights]
+    columns += [ q.var_name for q in tabulation.strata_components(qdc_strf)]
+    # Unweighted and weighted tables are counted in one pass.
+    return(list(shard.sharded_counts(
+        df, columns, tabulation.count_multi_binaries, q_var_names, qdc_strf, fetch_value,
+        weights=weights, with_raw=True, n_workers=n_workers)))
+
+def multi_binaries_result(
+    df : pd.DataFrame,
+    q_var_names : List[str],
+    qdcs_dic : Dict[str, vs.QuestionDataContainer],
+    qdc_strf : vs.QuestionDataContainer, 
+    fetch_value : Any = 1,
+    weights : Optional[str] = None,
+    cache : Optional[ReportCache] = None,
+    n_workers : Optional[Union[int, shard.ShardPool]] = 1,
+) -> tabulation.MultiBinariesResult:
+    """Count yes for multiple binary question items once. 
+    Number and percentage tables are derived from the returned object.
+    See obtain_multi_binaries_items_with_strat for parameters.
+    If weights is given, unweighted number is kept as "raw_number".
+    If cache is given, count tables are loaded from the cache when 
+    the used columns and qdc_strf are unchanged.
+    """
+    if isinstance(cache, type(None)):
+        counts = multi_binaries_counts(df, q_var_names, qdc_strf, fetch_value, weights, n_workers)
+    else:
+        columns = list(q_var_names) + [weights]
+        columns += [ q.var_name for q in tabulation.strata_components(qdc_strf)]
+        key = cache.table_key(df, columns, "multi_binaries", qdc_strf, fetch_value)
+        counts = cache.load_counts(key)
+        if isinstance(counts, type(None)):
+            counts = multi_binaries_counts(
+                df, q_var_names, qdc_strf, fetch_value, weights, n_workers)
+            cache.save_counts(key, counts)
+
+    if isinstance(weights, type(None)):
+        return(tabulation.multi_binaries_from_counts(
+            counts[0], counts[1], q_var_names, qdcs_dic, qdc_strf, fetch_value))
+    return(tabulation.multi_binaries_from_counts(
+        counts[2], counts[3], q_var_names, qdcs_dic, qdc_strf, fetch_value, 
+        raw_counts=counts[0]))
+
 def barplot_multi_binaries_with_strat(
     df_sum : pd.Series,
     vis_var : vs.VisVariables,
     percentage : bool = False,
-    legend : bool = True
+    legend : bool = True,
+    variants : bool = False,
+    renderer : Optional[render.ParallelRenderer] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Plot multiple binary items simultaneously.
+    If variants is True, a figure without legend and a legend only figure 
+    are also saved. If renderer is given, the figure is rendered in its 
+    worker processes. If cache is given, cached figures are restored 
+    instead of rendering.
     """
     order = df_sum.columns
     if isinstance(vis_var.title, type(None)):
@@ -438,27 +733,35 @@ def barplot_multi_binaries_with_strat(
         if not vis_var.ylim:
             vis_var.ylim = [0,100]
 
+    from . import vis_utils
     vis_var = vis_utils.obtain_cmap4labels(order, np.nan, vis_var)
-    vis = vis_utils.SingleVis(vis_var=vis_var)
-    vis.barplot_multi_binaries_with_strat(df_sum, legend=legend)
+    job = render.RenderJob("barplot_multi_binaries_with_strat", df_sum, vis_var, 
+                           dict(legend=legend, variants=variants))
+    render.submit_job(job, renderer, cache)
 
 def output_multi_binaries_with_strat(
-    df : pd.DataFrame,
+    df : Union[pd.DataFrame, stream.ChunkedTabulator],
     q_var_names: List[str], 
     qdcs_dic : Dict[str, vs.QuestionDataContainer],
     qdc_strf : vs.QuestionDataContainer,
     vis_var : Optional[vs.VisVariables] = None,
     save_fig_path : Optional[str] = None,
-    save_num_path : Optional[str] = None,
+    save_num_path : Optional[Union[str, utils.NumberWriter]] = None,
     show : bool = True,
     percentage : bool = True,
     transpose : bool = False,
     decimal : int = 2,
+    renderer : Optional[render.ParallelRenderer] = None,
+    headless : Optional[bool] = None,
+    weights : Optional[str] = None,
+    cache : Optional[ReportCache] = None,
 ) -> None:
     """Output cross-tabulated data as number/percentage and a figure.
 
     Args:
-        df :
+        df : DataFrame, or stream.ChunkedTabulator which holds counts of 
+            q_var_names as a group of multi_binaries and qdc_strf.
+            An exception is raised if qdcs differ from those of the tabulator.
         q_var_names :
         qdcs_dic : 
         qdc_strf :
@@ -469,48 +772,95 @@ def output_multi_binaries_with_strat(
         show : Takes True, False, "number", "figure".
         transpose : If True, x and y axis is swapped when plotting.
         decimal : Round to "decimal"th place when exporting a percentage.
+        renderer : If given, figures are rendered in its worker processes.
+            See render.ParallelRenderer.
+        headless : If True, no figure is created when save_fig_path is None and 
+            figures are not shown. If None, the global setting is used. 
+            See render.set_headless.
+        weights : a column name of weights. If given, weighted number and
+            percentage are output with unweighted number.
+        cache : If given, count tables and figures are reused from the cache 
+            when their inputs are unchanged. See cache.ReportCache.
     """
-    df_num = obtain_multi_binaries_items_with_strat(
-           df, q_var_names, qdcs_dic, qdc_strf, percentage=False)
-    df_per = obtain_multi_binaries_items_with_strat(
-           df, q_var_names, qdcs_dic, qdc_strf, percentage=True)
+    if isinstance(df, stream.ChunkedTabulator):
+        if (not isinstance(weights, type(None))) and (weights != df.weights):
+            raise Exception(f"Counts are tabulated with weights={df.weights}")
+        df.check_qdcs([ qdcs_dic[v] for v in q_var_names] + [qdc_strf])
+        result = df.multi_binaries_result(q_var_names, qdc_strf.var_name)
+    else:
+        result = multi_binaries_result(df, q_var_names, qdcs_dic, qdc_strf, weights=weights,
+                                       cache=cache)
+    output_multi_binaries_result(
+        result, q_var_names, vis_var=vis_var, save_fig_path=save_fig_path, 
+        save_num_path=save_num_path, show=show, percentage=percentage, 
+        transpose=transpose, decimal=decimal, renderer=renderer, cache=cache, 
+        headless=headless,
+    )
+
+def output_multi_binaries_result(
+    result : tabulation.MultiBinariesResult,
+    q_var_names: List[str], 
+    vis_var : Optional[vs.VisVariables] = None,
+    save_fig_path : Optional[str] = None,
+    save_num_path : Optional[Union[str, utils.NumberWriter]] = None,
+    show : bool = True,
+    percentage : bool = True,
+    transpose : bool = False,
+    decimal : int = 2,
+    renderer : Optional[render.ParallelRenderer] = None,
+    headless : Optional[bool] = None,
+    cache : Optional[ReportCache] = None,
+) -> None:
+    """Output already tabulated multiple binary items as number/percentage 
+    and a figure. See output_multi_binaries_with_strat for parameters.
+
+    Args:
+        result : a result created by multi_binaries_result.
+    """
+    df_num = result.number
+    df_per = result.percentage
+    df_raw = result.raw_number
     if transpose:
         df_num = df_num.T
         df_per = df_per.T
+        df_raw = df_raw.T if df_raw is not None else None
 
     # Number part.
     if (show == True) or (show == "number"):
+        if df_raw is not None:
+            display(df_raw)
         display(df_num)
         display(df_per)
     if not isinstance(save_num_path, type(None)):
         pre_title = "_".join(q_var_names)
-        utils.save_number_to_data(df_num, save_num_path, title=f"raw number,{pre_title}")
+        if df_raw is None:
+            utils.save_number_to_data(df_num, save_num_path, title=f"raw number,{pre_title}",
+                                      sheet_name=pre_title)
+        else:
+            utils.save_number_to_data(df_raw, save_num_path, title=f"raw number,{pre_title}",
+                                      sheet_name=pre_title)
+            utils.save_number_to_data(df_num, save_num_path, 
+                                      title=f"weighted number,{pre_title}",
+                                      decimal=decimal, sheet_name=pre_title)
         utils.save_number_to_data(
-            df_per, save_num_path, title=f"percentage(%) ,{pre_title} ", decimal=decimal)
-    if isinstance(vis_var, type(None)):
-        vis_var = vs.VisVariables()
-
+            df_per, save_num_path, title=f"percentage(%) ,{pre_title} ", decimal=decimal,
+            sheet_name=pre_title)
 
     # Visualization.
+    show_figure = (show == True) or (show == "figure")
+    if not render.needs_figure(save_fig_path, show_figure, headless):
+        return
     if isinstance(vis_var, type(None)):
         vis_var = vs.VisVariables()
     else:
         vis_var = copy.deepcopy(vis_var)
-    if (show == True) or (show == "figure"):
-        vis_var.show = True
-    else:
-        vis_var.show = False
+    vis_var.show = show_figure
 
     df_ = df_per if percentage else df_num
-    path_output = utils.PathOutput(save_fig_path)
-
-    vis_var.save_fig_path = path_output.raw
-    barplot_multi_binaries_with_strat(df_, vis_var, percentage=percentage, legend=True)
-
-    vis_var.save_fig_path = path_output.no_label
-    barplot_multi_binaries_with_strat(df_, vis_var, percentage=percentage, legend=False)
 
-    # Create label only
-    vis_var.save_fig_path = path_output.label_only
-    vis_utils.label_only_fig(vis_var, df_)
+    # A figure without legend and a legend only figure are saved from one figure.
+    vis_var.save_fig_path = save_fig_path
+    barplot_multi_binaries_with_strat(df_, vis_var, percentage=percentage, 
+                                      legend=True, variants=True, renderer=renderer, 
+                                      cache=cache)
 
@@ -0,0 +1,156 @@
+from typing import Union, Optional, List, Dict, Tuple, Any
+from dataclasses import dataclass, field
+import concurrent.futures
+import copy
+
+import pandas as pd
+
+from . import variables as vs
+from . import cache as cache_module
+
+# If True, figures which are neither saved nor shown are not created.
+HEADLESS = False
+
+def set_headless(headless : bool = True) -> None:
+    """Set the default of "headless" of output functions globally.
+    In headless mode, matplotlib is not even imported when figures are 
+    neither saved nor shown.
+
+    Examples:
+        >>> set_headless(True)
+        >>> output_crosstab_cate_barplot(df, qdc, qdc_strf, save_num_path="number.csv",
+        >>>                              show=False)
+    """
+    global HEADLESS
+    HEADLESS = headless
+
+def needs_figure(
+    save_fig_path : Optional[str], 
+    show : bool, 
+    headless : Optional[bool] = None,
+) -> bool:
+    """Judge whether a figure should be created.
+
+    Args:
+        save_fig_path : path for saving a figure.
+        show : If True, a figure is shown.
+        headless : If True, a figure is created only when it is saved or shown.
+            If None, HEADLESS is used.
+    """
+    if headless is None:
+        headless = HEADLESS
+    return(not (headless and isinstance(save_fig_path, type(None)) and (not show)))
+
+@dataclass
+class RenderJob():
+    """Picklable job to render one figure.
+
+    Args:
+        kind : "heatmap_crosstab" or a name of plotting method of vis_utils.SingleVis.
+        tab : data to be plotted.
+        vis_var : visualization parameters. Paths are taken from save_fig_path.
+        options : keyword arguments passed to the plotting function.
+    """
+    kind : str
+    tab : Union[pd.DataFrame, pd.Series]
+    vis_var : vs.VisVariables
+    options : Dict[str, Any] = field(default_factory=dict)
+
+def run_job(job : RenderJob) -> None:
+    """Render a figure in the current process.
+    """
+    from . import vis_utils
+    if job.kind == "heatmap_crosstab":
+        vis_utils.heatmap_crosstab(job.tab, vis_var=job.vis_var, **job.options)
+    else:
+        vis = vis_utils.SingleVis(vis_var=job.vis_var)
+        getattr(vis, job.kind)(job.tab, **job.options)
+
+def init_worker(rc_params : Dict[str, Any]) -> None:
+    """Use Agg backend and the same rcParams as the parent process.
+    """
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+    matplotlib.rcParams.update(rc_params)
+
+class ParallelRenderer():
+    def __init__(self, n_workers : Optional[int] = None, mp_context : Any = None) -> None:
+        """Render figures in worker processes with Agg backend.
+        Tabulation stays in the parent process and only render jobs are sent.
+        Figures are not shown in this mode.
+
+        Args:
+            n_workers : the number of worker processes. If None,
+                the number of processors is used.
+            mp_context : multiprocessing context passed to ProcessPoolExecutor.
+
+        Examples:
+            >>> with ParallelRenderer(n_workers=8) as renderer:
+            >>>     for var_name in var_names:
+            >>>         output_crosstab_cate_barplot(df, qdcs_dic[var_name], qdc_strf,
+            >>>             save_fig_path=f"fig/{var_name}.png", show=False,
+            >>>             renderer=renderer)
+        """
+        import matplotlib
+        from . import vis_utils # rcParams set by japanize_matplotlib are passed.
+        rc_params = { k : v for k, v in matplotlib.rcParams.items() if k != "backend"}
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=mp_context,
+            initializer=init_worker, initargs=(rc_params,),
+        )
+        self.futures = []
+
+    def submit(self, job : RenderJob) -> concurrent.futures.Future:
+        job = copy.deepcopy(job)
+        job.vis_var.show = False
+        future = self.executor.submit(run_job, job)
+        self.futures.append(future)
+        return(future)
+
+    def wait(self) -> None:
+        """Wait for all submitted jobs. An exception in a worker is raised here.
+        """
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        try:
+            self.wait()
+        finally:
+            self.executor.shutdown()
+
+    def __enter__(self) -> "ParallelRenderer":
+        return(self)
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def submit_job(
+    job : RenderJob, 
+    renderer : Optional[ParallelRenderer] = None,
+    cache : Optional[cache_module.ReportCache] = None,
+) -> None:
+    """Render a figure now if renderer is None, otherwise send it to the renderer.
+    If cache is given and the same figure is cached, saved files are restored 
+    from the cache without rendering unless the figure is shown.
+    """
+    paths = cache_module.figure_paths(job.vis_var.save_fig_path, 
+                                      job.options.get("variants", False))
+    if isinstance(cache, type(None)) or (not paths):
+        cache = None
+    else:
+        key = cache.figure_key(job)
+        if (not job.vis_var.show) and cache.restore_figure(key, paths):
+            return
+        stats = { role : cache_module.file_stat(path) for role, path in paths.items()}
+
+    if renderer is None:
+        run_job(job)
+        if cache is not None:
+            cache.save_figure(key, paths, stats)
+    else:
+        future = renderer.submit(job)
+        if cache is not None:
+            future.add_done_callback(
+                lambda f: (f.exception() is None) and cache.save_figure(key, paths, stats))
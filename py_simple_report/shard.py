@@ -0,0 +1,209 @@
+from typing import Union, Optional, List, Dict, Tuple, Any, Callable
+from dataclasses import dataclass
+import concurrent.futures
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .cache import column_fingerprint
+from .stream import add_counts
+
+# Memory-mapped columns are written here if it exists, to keep them in memory.
+SHM_DIR = "/dev/shm"
+
+@dataclass
+class ColumnSpec():
+    """Picklable description of a column written to a .npy file.
+
+    Args:
+        name : column name.
+        path : path of .npy file of values, or codes if categories is not None.
+        categories : categories of a categorical column.
+    """
+    name : str
+    path : str
+    categories : Optional[pd.Index] = None
+
+def write_columns(
+    df : pd.DataFrame,
+    columns : List[str],
+    directory : str,
+    prefix : str = "",
+) -> List[ColumnSpec]:
+    """Write columns of df as .npy files which workers map into memory.
+    Numerical columns are written as they are, and other columns are written
+    as categorical codes with their categories.
+
+    Args:
+        prefix : prefix of file names, to write columns into one directory
+            by multiple calls.
+    """
+    specs = []
+    for i, col in enumerate(columns):
+        ser = df[col]
+        categories = None
+        if isinstance(ser.dtype, pd.CategoricalDtype):
+            values = ser.cat.codes.to_numpy()
+            categories = ser.cat.categories
+        elif isinstance(ser.dtype, np.dtype) and (ser.dtype.kind in "biuf"):
+            values = ser.to_numpy()
+        elif pd.api.types.is_numeric_dtype(ser.dtype):
+            values = ser.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            # NaN is coded as -1 by default.
+            codes, categories = pd.factorize(ser)
+            values = codes
+        path = os.path.join(directory, f"{prefix}{i}.npy")
+        np.save(path, values)
+        specs.append(ColumnSpec(col, path, categories))
+    return(specs)
+
+def read_shard(specs : List[ColumnSpec], start : int, stop : int) -> pd.DataFrame:
+    """Read rows from start to stop of columns written by write_columns.
+    """
+    data = {}
+    for spec in specs:
+        values = np.load(spec.path, mmap_mode="r")[start:stop]
+        if spec.categories is None:
+            data[spec.name] = np.asarray(values)
+        else:
+            data[spec.name] = pd.Categorical.from_codes(
+                np.asarray(values), categories=spec.categories)
+    return(pd.DataFrame(data, index=pd.RangeIndex(start, stop)))
+
+def count_shard(
+    specs : List[ColumnSpec],
+    start : int,
+    stop : int,
+    func : Callable[..., Any],
+    args : Tuple[Any, ...],
+    kwgs : Dict[str, Any],
+) -> Any:
+    return(func(read_shard(specs, start, stop), *args, **kwgs))
+
+def shard_bounds(n_rows : int, n_shards : int) -> List[Tuple[int, int]]:
+    """Split rows into n_shards contiguous ranges of almost the same size.
+    """
+    bounds = np.linspace(0, n_rows, max(min(n_shards, n_rows), 1) + 1).astype(np.int64)
+    return([ (int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])])
+
+class ShardPool():
+    def __init__(self, n_workers : Optional[int] = None, mp_context : Any = None) -> None:
+        """Worker processes and memory-mapped columns shared by calls of 
+        "sharded_counts". Columns of a DataFrame are written at their first use
+        and reused by later calls while cache.column_fingerprint of each column
+        is unchanged. A column assigned new values is written again, and so is
+        a column edited through pandas with copy-on-write (default since pandas 3.0).
+        Pass the pool as n_workers of tabulation functions.
+
+        Args:
+            n_workers : the number of worker processes. If None,
+                the number of processors is used.
+            mp_context : multiprocessing context passed to ProcessPoolExecutor.
+
+        Examples:
+            >>> with ShardPool(n_workers=8) as pool:
+            >>>     for var_name in var_names:
+            >>>         result = crosstab_result(df, qdcs_dic[var_name], qdc_strf, n_workers=pool)
+        """
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        shm_dir = SHM_DIR if os.path.isdir(SHM_DIR) else None
+        self.directory = tempfile.TemporaryDirectory(dir=shm_dir, prefix="py_simple_report_")
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.n_workers, mp_context=mp_context)
+        # id(df) : (df, {column : (Series, fingerprint, ColumnSpec)}). 
+        # df and Series are kept so that their ids and buffers are not reused.
+        self.frames = {}
+        self.n_written = 0
+
+    def specs(self, df : pd.DataFrame, columns : List[str]) -> List[ColumnSpec]:
+        """Specs of columns of df. Only columns not written yet or changed
+        since written are written.
+        """
+        if id(df) not in self.frames:
+            self.frames[id(df)] = (df, {})
+        _, written = self.frames[id(df)]
+        series = { c : df[c] for c in columns}
+        fingerprints = { c : column_fingerprint(ser) for c, ser in series.items()}
+        new = [ c for c in columns 
+                if (c not in written) or (written[c][1] != fingerprints[c])]
+        if new:
+            prefix = f"{self.n_written}_"
+            self.n_written += 1
+            for spec in write_columns(df, new, self.directory.name, prefix=prefix):
+                written[spec.name] = (series[spec.name], fingerprints[spec.name], spec)
+        return([ written[c][2] for c in columns])
+
+    def counts(
+        self,
+        df : pd.DataFrame,
+        columns : List[Optional[str]],
+        func : Callable[..., Any],
+        *args,
+        **kwgs,
+    ) -> Any:
+        """See "sharded_counts".
+        """
+        if (self.n_workers <= 1) or (len(df) < 2):
+            return(func(df, *args, **kwgs))
+        specs = self.specs(df, list(dict.fromkeys( c for c in columns if c is not None)))
+        futures = [ self.executor.submit(count_shard, specs, start, stop, func, args, kwgs)
+                    for start, stop in shard_bounds(len(df), self.n_workers)]
+        total = {}
+        for future in futures:
+            add_counts(total, "counts", future.result())
+        return(total["counts"])
+
+    def close(self) -> None:
+        try:
+            self.executor.shutdown()
+        finally:
+            self.frames = {}
+            self.directory.cleanup()
+
+    def __enter__(self) -> "ShardPool":
+        return(self)
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def sharded_counts(
+    df : pd.DataFrame,
+    columns : List[Optional[str]],
+    func : Callable[..., Any],
+    *args,
+    n_workers : Optional[Union[int, ShardPool]] = 1,
+    mp_context : Any = None,
+    **kwgs,
+) -> Any:
+    """Call func(df, *args, **kwgs) for shards of rows in worker processes
+    and sum up returned count tables.
+    Used columns are passed to workers as memory-mapped files, not by pickling df.
+    Since counts are summed up, results are exactly the same as func(df)
+    for integer counts. Weighted counts are float sums added in another order,
+    so they can differ from func(df) in the last bits.
+
+    Args:
+        df : DataFrame.
+        columns : columns used by func. None is ignored.
+        func : picklable function which returns a count table or a tuple of them.
+            See tabulation.count_crosstab.
+        n_workers : the number of worker processes. If None, the number of
+            processors is used. If 1, func is called in the current process.
+            If ShardPool is given, its processes and written columns are reused.
+        mp_context : multiprocessing context passed to ProcessPoolExecutor.
+
+    Examples:
+        >>> counts = sharded_counts(df, ["q1", "sex"], tabulation.count_crosstab,
+        >>>                         qdcs_dic["q1"], qdcs_dic["sex"], n_workers=8)
+    """
+    if isinstance(n_workers, ShardPool):
+        return(n_workers.counts(df, columns, func, *args, **kwgs))
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    if (n_workers <= 1) or (len(df) < 2):
+        return(func(df, *args, **kwgs))
+    with ShardPool(n_workers=n_workers, mp_context=mp_context) as pool:
+        return(pool.counts(df, columns, func, *args, **kwgs))
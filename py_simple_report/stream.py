@@ -0,0 +1,343 @@
+from typing import Union, Optional, List, Dict, Tuple, Any, Iterable, Iterator
+from collections import OrderedDict
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from . import variables as vs
+from . import tabulation
+from .__version__ import __version__
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+def read_chunks(
+    source : Union[str, os.PathLike, Iterable[pd.DataFrame]],
+    columns : Optional[List[str]] = None,
+    chunksize : int = 100_000,
+    **read_kwgs,
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Parquet file chunk by chunk. Only "columns" are read.
+
+    Args:
+        source : a path of CSV or Parquet file, or an iterable of DataFrames.
+            Files with extension ".parquet" or ".pq" are read as Parquet,
+            which requires pyarrow.
+        columns : columns to be read. If None, all columns are read.
+        chunksize : the number of rows of each chunk.
+        read_kwgs : keyword arguments passed to pd.read_csv.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        for df in source:
+            yield df if columns is None else df[columns]
+    elif str(source).lower().endswith(PARQUET_EXTENSIONS):
+        import pyarrow.parquet as pq
+        with pq.ParquetFile(source) as f:
+            for batch in f.iter_batches(batch_size=chunksize, columns=columns):
+                yield batch.to_pandas()
+    else:
+        with pd.read_csv(source, usecols=columns, chunksize=chunksize, **read_kwgs) as reader:
+            for df in reader:
+                yield df
+
+def add_counts(dic : Dict[Any, Any], key : Any, counts : Any) -> None:
+    """Add counts to dic[key]. A tuple of count tables is added elementwise.
+    """
+    if key not in dic:
+        dic[key] = counts
+    elif isinstance(counts, tuple):
+        dic[key] = tuple( a + b for a, b in zip(dic[key], counts))
+    else:
+        dic[key] = dic[key] + counts
+
+class ChunkedTabulator():
+    def __init__(
+        self,
+        qdcs_dic : Dict[str, vs.QuestionDataContainer],
+        strata : List[Union[str, vs.QuestionDataContainer, List, Tuple]],
+        var_names : Optional[List[str]] = None,
+        multi_binaries : Optional[Dict[str, List[str]]] = None,
+        include_all : bool = True,
+        fetch_value : Any = 1,
+        weights : Optional[str] = None,
+    ) -> None:
+        """Tabulate data chunk by chunk. Count tables of each chunk are summed up,
+        so memory depends on the number of categories, not the number of rows.
+
+        Args:
+            qdcs_dic : qdcs for question variables and stratifications.
+            strata : var_names or qdcs for stratification. A list or tuple of them 
+                is a nested stratification. See tabulation.resolve_strata.
+            var_names : question variables cross-tabulated with each stratification.
+                If None, all variables of qdcs_dic except for strata and
+                multi_binaries are used.
+            multi_binaries : groups of multiple binary items. Keys are names
+                of groups and values are var_names of items.
+            include_all : If True, "All" margins are added to crosstab tables.
+            fetch_value : a value for flag yes of multiple binary items.
+            weights : a column name of weights. If given, weights are summed up
+                and unweighted counts are also kept.
+
+        Examples:
+            >>> tabulator = ChunkedTabulator(qdcs_dic, strata=["sex"],
+            >>>     multi_binaries={"symptoms" : ["fever", "cough"]})
+            >>> tabulator.update_from_source("survey.csv", chunksize=1_000_000)
+            >>> tab = tabulator.crosstab_results["q1", "sex"].row_percentage
+            >>> tab = tabulator.multi_binaries_results["symptoms", "sex"].percentage
+
+            Counts can be saved and updated only with new rows later.
+
+            >>> tabulator.save("counts.pkl")
+            >>> tabulator = ChunkedTabulator.load("counts.pkl", qdcs_dic)
+            >>> tabulator.update(df_new).save("counts.pkl")
+        """
+        self.qdcs_dic = qdcs_dic
+        self.strata = tabulation.resolve_strata(strata, qdcs_dic)
+        self.multi_binaries = multi_binaries if multi_binaries else {}
+        if var_names is None:
+            excluded = [ q.var_name for qdc_strf in self.strata
+                         for q in tabulation.strata_components(qdc_strf)]
+            for items in self.multi_binaries.values():
+                excluded += items
+            var_names = [ v for v in qdcs_dic.keys() if v not in excluded]
+        self.var_names = var_names
+        self.include_all = include_all
+        self.fetch_value = fetch_value
+        self.weights = weights
+        self.n_rows = 0
+        self.counts = OrderedDict()
+        self.raw_counts = OrderedDict()
+        self.binary_counts = OrderedDict()
+        self.raw_binary_counts = OrderedDict()
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns required for tabulation.
+        """
+        columns = list(self.var_names)
+        columns += [ q.var_name for qdc_strf in self.strata
+                     for q in tabulation.strata_components(qdc_strf)]
+        for items in self.multi_binaries.values():
+            columns += items
+        if self.weights is not None:
+            columns.append(self.weights)
+        return(list(dict.fromkeys(columns)))
+
+    def update(self, df : pd.DataFrame) -> "ChunkedTabulator":
+        """Add counts of a chunk of data.
+        """
+        positions = {}
+        for qdc in [ self.qdcs_dic[v] for v in self.var_names] + self.strata:
+            if id(qdc) not in positions:
+                positions[id(qdc)] = tabulation.decode_column(df, qdc)
+        w = tabulation.weights_array(df, self.weights)
+
+        for qdc_strf in self.strata:
+            pos_strf = positions[id(qdc_strf)]
+            n_strf = len(tabulation.category_labels(qdc_strf)) + 1
+            for var_name in self.var_names:
+                qdc = self.qdcs_dic[var_name]
+                n = len(tabulation.category_labels(qdc)) + 1
+                key = (var_name, qdc_strf.var_name)
+                counts = tabulation.count_positions(
+                    pos_strf, n_strf, positions[id(qdc)], n, weights=w, with_raw=True)
+                if w is None:
+                    add_counts(self.counts, key, counts)
+                else:
+                    add_counts(self.raw_counts, key, counts[0])
+                    add_counts(self.counts, key, counts[1])
+
+            for name, items in self.multi_binaries.items():
+                key = (name, qdc_strf.var_name)
+                counts = tabulation.count_multi_binaries(
+                    df, items, qdc_strf, self.fetch_value, positions_strf=pos_strf,
+                    weights=self.weights, with_raw=True)
+                if w is None:
+                    add_counts(self.binary_counts, key, counts)
+                else:
+                    add_counts(self.raw_binary_counts, key, counts[:2])
+                    add_counts(self.binary_counts, key, counts[2:])
+        self.n_rows += len(df)
+        return(self)
+
+    def update_from_source(
+        self,
+        source : Union[str, os.PathLike, Iterable[pd.DataFrame]],
+        chunksize : int = 100_000,
+        **read_kwgs,
+    ) -> "ChunkedTabulator":
+        """Read only required columns of source chunk by chunk and add counts.
+        See read_chunks for parameters.
+        """
+        for df in read_chunks(source, self.columns, chunksize=chunksize, **read_kwgs):
+            self.update(df)
+        return(self)
+
+    def update_appended(self, df : pd.DataFrame) -> "ChunkedTabulator":
+        """Add counts of rows appended after the rows already counted.
+        Rows of df are assumed to be only appended, like responses of 
+        a survey collected continuously.
+
+        Examples:
+            >>> tabulator = ChunkedTabulator.load("counts.pkl")
+            >>> tabulator.update_appended(df).save("counts.pkl")
+        """
+        if len(df) < self.n_rows:
+            raise Exception(f"df has {len(df)} rows, but {self.n_rows} rows are already counted")
+        return(self.update(df.iloc[self.n_rows:]))
+
+    def merge(self, other : "ChunkedTabulator") -> "ChunkedTabulator":
+        """Add counts of other tabulator with the same variables and stratifications.
+        """
+        if self.config_key() != other.config_key():
+            raise Exception("Tabulators with different variables, stratifications or "
+                            "qdcs can not be merged")
+        for name in ["counts", "raw_counts", "binary_counts", "raw_binary_counts"]:
+            dic = getattr(self, name)
+            for key, counts in getattr(other, name).items():
+                add_counts(dic, key, counts)
+        self.n_rows += other.n_rows
+        return(self)
+
+    def config_key(self) -> str:
+        """Hash of qdcs and parameters which determine shapes of count tables.
+        """
+        from .cache import hash_key
+        qdcs = [ self.qdcs_dic[v] for v in self.var_names]
+        binary_qdcs = { name : [ self.qdcs_dic[v] for v in items] 
+                        for name, items in self.multi_binaries.items()}
+        return(hash_key(qdcs, self.strata, binary_qdcs, self.fetch_value, self.weights))
+
+    def check_qdcs(self, qdcs : List[vs.QuestionDataContainer]) -> None:
+        """Raise an exception if qdcs differ from those used for counting,
+        since counts have to be tabulated again.
+        """
+        from .cache import hash_key
+        stored = dict(self.qdcs_dic)
+        stored.update({ q.var_name : q for q in self.strata})
+        for qdc in qdcs:
+            if qdc.var_name not in stored:
+                raise Exception(f"{qdc.var_name} is not tabulated by this tabulator")
+            if hash_key(qdc) != hash_key(stored[qdc.var_name]):
+                raise Exception(f"qdc of {qdc.var_name} is changed after it was tabulated")
+
+    def save(self, path : Union[str, os.PathLike]) -> None:
+        """Save counts with qdcs and parameters. Reload it by "load".
+        """
+        state = dict(self.__dict__, version=__version__)
+        with open(path, "wb") as f:
+            pickle.dump(state, f)
+
+    @classmethod
+    def load(
+        cls, 
+        path : Union[str, os.PathLike],
+        qdcs_dic : Optional[Dict[str, vs.QuestionDataContainer]] = None,
+    ) -> "ChunkedTabulator":
+        """Load a tabulator saved by "save".
+
+        Args:
+            path : a path of saved tabulator.
+            qdcs_dic : If given, an exception is raised when qdcs of saved 
+                tabulator, including those of strata and multi_binaries, 
+                differ from these qdcs, since counts have to be tabulated again.
+        """
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        state.pop("version", None)
+        tabulator = cls.__new__(cls)
+        tabulator.__dict__.update(state)
+        if not isinstance(qdcs_dic, type(None)):
+            tabulator.check_saved_qdcs(qdcs_dic, path)
+        return(tabulator)
+
+    def check_saved_qdcs(
+        self, 
+        qdcs_dic : Dict[str, vs.QuestionDataContainer], 
+        path : Union[str, os.PathLike],
+    ) -> None:
+        """Raise an exception at the first qdc of qdcs_dic which differs from
+        the saved one. Strata are built again from qdcs_dic.
+        """
+        from .cache import hash_key
+        saved = dict(self.qdcs_dic)
+        for qdc_strf in self.strata:
+            saved.update({ q.var_name : q for q in tabulation.strata_components(qdc_strf)})
+        names = list(self.var_names) + [ q.var_name for qdc_strf in self.strata
+                                         for q in tabulation.strata_components(qdc_strf)]
+        for items in self.multi_binaries.values():
+            names += items
+        for var_name in dict.fromkeys(names):
+            if var_name not in qdcs_dic:
+                raise Exception(f"{var_name} tabulated in {path} is not contained in qdcs_dic")
+            if hash_key(qdcs_dic[var_name]) != hash_key(saved[var_name]):
+                raise Exception(f"qdc of {var_name} is changed after {path} was saved")
+
+        strata = []
+        for qdc_strf in self.strata:
+            qdcs = [ qdcs_dic[q.var_name] for q in tabulation.strata_components(qdc_strf)]
+            if isinstance(qdc_strf, vs.NestedQuestionDataContainer):
+                strata.append(vs.NestedQuestionDataContainer.from_qdcs(qdcs, sep=qdc_strf.sep))
+            else:
+                strata.append(qdcs[0])
+        new = ChunkedTabulator(qdcs_dic, strata, var_names=self.var_names,
+                               multi_binaries=self.multi_binaries, 
+                               include_all=self.include_all,
+                               fetch_value=self.fetch_value, weights=self.weights)
+        if new.config_key() != self.config_key():
+            raise Exception(f"stratifications are changed after {path} was saved")
+
+    def crosstab_result(
+        self, 
+        var_name : str, 
+        strf_name : str,
+        include_all : Optional[bool] = None,
+    ) -> tabulation.CrosstabResult:
+        """Result of var_name stratified by strf_name.
+        If include_all is None, self.include_all is used.
+        """
+        qdc_strf = { q.var_name : q for q in self.strata}[strf_name]
+        if isinstance(include_all, type(None)):
+            include_all = self.include_all
+        return(tabulation.CrosstabResult(
+            self.qdcs_dic[var_name], qdc_strf, self.counts[var_name, strf_name], 
+            margins=include_all, raw_counts=self.raw_counts.get((var_name, strf_name))))
+
+    @property
+    def crosstab_results(self) -> Dict[Tuple[str, str], tabulation.CrosstabResult]:
+        """Keys are (var_name, var_name of stratification).
+        """
+        results = OrderedDict()
+        for var_name, strf_name in self.counts.keys():
+            results[var_name, strf_name] = self.crosstab_result(var_name, strf_name)
+        return(results)
+
+    def multi_binaries_result(
+        self, 
+        name : Union[str, List[str]], 
+        strf_name : str,
+    ) -> tabulation.MultiBinariesResult:
+        """Result of a group of multiple binary items stratified by strf_name.
+        A group is specified by its name or var_names of its items.
+        """
+        if not isinstance(name, str):
+            names = [ k for k, items in self.multi_binaries.items() if list(items) == list(name)]
+            if not names:
+                raise Exception(f"{name} is not contained in multi_binaries")
+            name = names[0]
+        qdc_strf = { q.var_name : q for q in self.strata}[strf_name]
+        counts, sizes = self.binary_counts[name, strf_name]
+        raw = self.raw_binary_counts.get((name, strf_name))
+        return(tabulation.multi_binaries_from_counts(
+            counts, sizes, self.multi_binaries[name], self.qdcs_dic, qdc_strf, 
+            self.fetch_value, raw_counts=None if raw is None else raw[0]))
+
+    @property
+    def multi_binaries_results(self) -> Dict[Tuple[str, str], tabulation.MultiBinariesResult]:
+        """Keys are (name of group, var_name of stratification).
+        """
+        results = OrderedDict()
+        for name, strf_name in self.binary_counts.keys():
+            results[name, strf_name] = self.multi_binaries_result(name, strf_name)
+        return(results)
@@ -0,0 +1,679 @@
+from typing import Union, Optional, List, Dict, Tuple, Any
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from . import variables as vs
+
+# Count tables with more cells than this are counted as scipy.sparse matrices
+# by "count_crosstab" with sparse=None.
+SPARSE_THRESHOLD = 1_000_000
+
+def unique_order(qdc : vs.QuestionDataContainer) -> List[Any]:
+    """Return "order" of qdc as a list without duplicated labels.
+    """
+    return(list(qdc.compile().order))
+
+def category_labels(qdc : vs.QuestionDataContainer) -> List[Any]:
+    """Return all labels of qdc. Labels of "order" come first, and 
+    labels of "dic" which are not contained in "order" follow them.
+    """
+    return(list(qdc.compile().labels))
+
+def decode_positions(ser : pd.Series, qdc : vs.QuestionDataContainer) -> np.ndarray:
+    """Decode a column into positions of labels returned by "category_labels".
+    Numerical codes are mapped through an integer lookup array if possible,
+    otherwise through a hash table of pd.Index.
+
+    Args:
+        ser : a column of original data.
+        qdc : a qdc of this column.
+
+    Returns:
+        Integer array. -1 is assigned to NaN which is not converted by qdc.dic,
+        and len(labels) is assigned to values which are not contained 
+        in qdc.dic nor labels.
+    """
+    cqdc = qdc.compile()
+    if isinstance(ser.dtype, pd.CategoricalDtype):
+        # Only categories are decoded.
+        codes = ser.cat.codes.to_numpy()
+        positions = decode_positions(pd.Series(ser.cat.categories), qdc)[codes]
+        positions[codes < 0] = cqdc.nan_pos
+        return(positions)
+    n = len(cqdc.labels)
+    values = ser.to_numpy()
+    if (cqdc.lookup is not None) and pd.api.types.is_numeric_dtype(values.dtype):
+        lookup = cqdc.lookup
+        values = values.astype(np.float64)
+        isna = np.isnan(values)
+        valid = (~isna) & (values >= 0) & (values < len(lookup))
+        valid[valid] = values[valid] == np.floor(values[valid])
+        positions = np.full(len(values), n, dtype=cqdc.code_dtype)
+        positions[valid] = lookup[values[valid].astype(np.int64)]
+    else:
+        pos_arr = np.append(cqdc.key_positions, n).astype(cqdc.code_dtype)
+        positions = pos_arr[cqdc.keys.get_indexer(values)]
+        isna = pd.isna(values)
+    positions[isna] = cqdc.nan_pos
+    return(positions)
+
+def decode_column(df : pd.DataFrame, qdc : vs.QuestionDataContainer) -> np.ndarray:
+    """Decode the column of qdc in df as "decode_positions". 
+    For vs.NestedQuestionDataContainer, columns of its qdcs are decoded 
+    and combined by "nested_positions".
+    """
+    if isinstance(qdc, vs.NestedQuestionDataContainer):
+        positions = [ decode_column(df, q) for q in qdc.qdcs]
+        return(nested_positions(positions, qdc))
+    return(decode_positions(df[qdc.var_name], qdc))
+
+def nested_positions(
+    positions : List[np.ndarray], 
+    qdc : vs.NestedQuestionDataContainer,
+) -> np.ndarray:
+    """Combine positions of qdcs of a nested qdc into positions of its labels.
+    A row becomes -1 if any of positions is -1, and becomes len(labels)
+    if any of labels is not contained in "order" of each qdc.
+    """
+    sizes = [ len(q.compile().order) for q in qdc.qdcs]
+    n = len(qdc.compile().labels)
+    isna = np.zeros(len(positions[0]), dtype=bool)
+    in_order = np.ones(len(positions[0]), dtype=bool)
+    for pos, size in zip(positions, sizes):
+        isna |= pos < 0
+        in_order &= (pos >= 0) & (pos < size)
+    combined = np.full(len(isna), n, dtype=qdc.compile().code_dtype)
+    combined[in_order] = np.ravel_multi_index([ pos[in_order] for pos in positions], sizes)
+    combined[isna] = -1
+    return(combined)
+
+def decode_categorical(ser : pd.Series, qdc : vs.QuestionDataContainer) -> pd.Series:
+    """Decode a column into a categorical series whose categories are 
+    fixed to "category_labels" of qdc. Values not contained in 
+    qdc.dic nor labels become NaN.
+    """
+    cqdc = qdc.compile()
+    positions = decode_positions(ser, qdc)
+    positions[positions == len(cqdc.labels)] = -1
+    cat = pd.Categorical.from_codes(positions, dtype=cqdc.dtype)
+    return(pd.Series(cat, index=ser.index, name=ser.name))
+
+def decode_labels(ser : pd.Series, qdc : vs.QuestionDataContainer) -> pd.Series:
+    """Decode a column into labels. This gives the same result as
+    ser.replace(qdc.dic) except that qdc.dic can be None.
+    """
+    labels = category_labels(qdc)
+    positions = decode_positions(ser, qdc)
+    unknown = positions == len(labels)
+    arr = np.array(labels + [np.nan], dtype=object)[positions]
+    arr[unknown] = ser.to_numpy()[unknown]
+    return(pd.Series(arr, index=ser.index, name=ser.name))
+
+def count_positions(
+    row_positions : np.ndarray,
+    n_row : int,
+    col_positions : np.ndarray,
+    n_col : int,
+    weights : Optional[np.ndarray] = None,
+    with_raw : bool = False,
+) -> np.ndarray:
+    """Count pairs of positions by grouped counting.
+    Negative positions are dropped like NaN in pd.crosstab.
+
+    Args:
+        weights : If given, weights of rows are summed up instead of counting.
+        with_raw : If True and weights is given, a tuple of unweighted and 
+            weighted count tables is returned from the same pairs.
+
+    Returns:
+        Array of shape (n_row, n_col).
+    """
+    keep = (row_positions >= 0) & (col_positions >= 0)
+    idx = row_positions[keep].astype(np.int64) * n_col + col_positions[keep]
+    w = None if weights is None else weights[keep]
+    counts = np.bincount(idx, weights=w, minlength=n_row*n_col).reshape(n_row, n_col)
+    if with_raw and (w is not None):
+        return((np.bincount(idx, minlength=n_row*n_col).reshape(n_row, n_col), counts))
+    return(counts)
+
+def count_positions_sparse(
+    row_positions : np.ndarray,
+    n_row : int,
+    col_positions : np.ndarray,
+    n_col : int,
+    weights : Optional[np.ndarray] = None,
+) -> Any:
+    """"count_positions" returning scipy.sparse CSR matrix, which holds only
+    observed pairs. Requires scipy.
+    """
+    from scipy import sparse
+    keep = (row_positions >= 0) & (col_positions >= 0)
+    data = np.ones(np.count_nonzero(keep), dtype=np.int64) if weights is None else weights[keep]
+    coo = sparse.coo_matrix(
+        (data, (row_positions[keep].astype(np.int64), col_positions[keep].astype(np.int64))),
+        shape=(n_row, n_col))
+    return(coo.tocsr()) # Duplicated pairs are summed up.
+
+def use_sparse(n_cells : int) -> bool:
+    """Judge whether a count table of n_cells should be sparse. 
+    False if scipy is not installed.
+    """
+    if n_cells <= SPARSE_THRESHOLD:
+        return(False)
+    try:
+        import scipy.sparse
+    except ImportError:
+        return(False)
+    return(True)
+
+def weights_array(df : pd.DataFrame, weights : Optional[str]) -> Optional[np.ndarray]:
+    """Return the column of weights as a float array. NaN weights are regarded as 0.
+    None is returned if weights is None.
+    """
+    if weights is None:
+        return(None)
+    w = df[weights].to_numpy(dtype=np.float64, na_value=np.nan)
+    return(np.nan_to_num(w, nan=0.0))
+
+def resolve_strata(
+    strata : List[Union[str, vs.QuestionDataContainer, List, Tuple]],
+    qdcs_dic : Dict[str, vs.QuestionDataContainer],
+) -> List[vs.QuestionDataContainer]:
+    """Convert var_names and lists of var_names in strata into qdcs.
+    A list or tuple becomes a vs.NestedQuestionDataContainer.
+
+    Examples:
+        >>> strata = resolve_strata(["sex", "age", ("sex", "age")], qdcs_dic)
+    """
+    def to_qdc(s):
+        return(qdcs_dic[s] if isinstance(s, str) else s)
+    resolved = []
+    for s in strata:
+        if isinstance(s, (list, tuple)):
+            s = vs.NestedQuestionDataContainer.from_qdcs([ to_qdc(q) for q in s])
+        resolved.append(to_qdc(s))
+    return(resolved)
+
+def strata_components(qdc_strf : vs.QuestionDataContainer) -> List[vs.QuestionDataContainer]:
+    """qdcs which a stratification consists of.
+    """
+    if isinstance(qdc_strf, vs.NestedQuestionDataContainer):
+        return(list(qdc_strf.qdcs))
+    return([qdc_strf])
+
+def strata_slots(positions : np.ndarray, qdc : vs.QuestionDataContainer) -> np.ndarray:
+    """Positions for a stratification axis of a joint count table. 
+    NaN (-1) is assigned to an extra slot after len(labels) so that 
+    it is kept when the axis is summed up.
+    """
+    n = len(category_labels(qdc))
+    return(np.where(positions < 0, n + 1, positions))
+
+def counts_from_joint(
+    joint : np.ndarray,
+    components : List[vs.QuestionDataContainer],
+    qdc_strf : vs.QuestionDataContainer,
+) -> np.ndarray:
+    """Roll up a joint count table to a count table of "count_crosstab" 
+    for qdc_strf, without scanning data again.
+
+    Args:
+        joint : counts whose axes are positions of "strata_slots" of 
+            components followed by positions of a question.
+        components : qdcs of stratification axes of joint.
+        qdc_strf : a qdc or a nested qdc whose qdcs are contained in components.
+
+    Returns:
+        Count table equivalent to "count_crosstab" for qdc_strf.
+    """
+    ids = [ id(q) for q in components]
+    axes = [ ids.index(id(q)) for q in strata_components(qdc_strf)]
+    others = tuple( i for i in range(len(components)) if i not in axes)
+    # Axes of qdc_strf in its order, then the question axis.
+    marginal = np.transpose(joint.sum(axis=others, keepdims=True), 
+                            axes + list(others) + [len(components)])
+    marginal = marginal.reshape(marginal.shape[:len(axes)] + marginal.shape[-1:])
+    if not isinstance(qdc_strf, vs.NestedQuestionDataContainer):
+        return(marginal[:-1]) # Drop NaN slot.
+    qdcs = strata_components(qdc_strf)
+    body = marginal[tuple(slice(len(q.compile().order)) for q in qdcs)]
+    body = body.reshape(-1, marginal.shape[-1])
+    valid = marginal[tuple(slice(len(category_labels(q)) + 1) for q in qdcs)]
+    rest = valid.reshape(-1, marginal.shape[-1]).sum(axis=0) - body.sum(axis=0)
+    return(np.vstack([body, rest]))
+
+def count_crosstab(
+    df : pd.DataFrame,
+    qdc : vs.QuestionDataContainer,
+    qdc_strf : vs.QuestionDataContainer,
+    weights : Optional[str] = None,
+    sparse : Optional[bool] = False,
+    with_raw : bool = False,
+) -> np.ndarray:
+    """Count table of qdc_strf (rows) and qdc (columns).
+    Rows and columns follow "category_labels", and the last row and column 
+    hold values not contained in labels.
+
+    Args:
+        weights : a column name of weights. If given, weights are summed up.
+        sparse : If True, scipy.sparse CSR matrix is returned. If None, it is 
+            returned when the table has more cells than SPARSE_THRESHOLD
+            and scipy is installed.
+        with_raw : If True and weights is given, a tuple of unweighted and 
+            weighted count tables is returned from one decoding.
+    """
+    pos = decode_positions(df[qdc.var_name], qdc)
+    pos_strf = decode_column(df, qdc_strf)
+    n = len(category_labels(qdc)) + 1
+    n_strf = len(category_labels(qdc_strf)) + 1
+    if sparse is None:
+        sparse = use_sparse(n*n_strf)
+    w = weights_array(df, weights)
+    if not sparse:
+        return(count_positions(pos_strf, n_strf, pos, n, weights=w, with_raw=with_raw))
+    counts = count_positions_sparse(pos_strf, n_strf, pos, n, weights=w)
+    if with_raw and (w is not None):
+        return((count_positions_sparse(pos_strf, n_strf, pos, n), counts))
+    return(counts)
+
+def count_categories(
+    df : pd.DataFrame,
+    qdc : vs.QuestionDataContainer,
+    weights : Optional[str] = None,
+    with_raw : bool = False,
+) -> np.ndarray:
+    """Count each of "category_labels" of qdc. NaN is dropped, and the last
+    element holds values not contained in labels.
+
+    Args:
+        weights : a column name of weights. If given, weights are summed up.
+        with_raw : If True and weights is given, a tuple of unweighted and 
+            weighted counts is returned from one decoding.
+    """
+    positions = decode_positions(df[qdc.var_name], qdc)
+    keep = positions >= 0
+    n = len(category_labels(qdc)) + 1
+    w = weights_array(df, weights)
+    if w is None:
+        return(np.bincount(positions[keep], minlength=n))
+    counts = np.bincount(positions[keep], weights=w[keep], minlength=n)
+    if with_raw:
+        return((np.bincount(positions[keep], minlength=n), counts))
+    return(counts)
+
+def dense(counts : Any) -> np.ndarray:
+    """Convert a count table of scipy.sparse into numpy array.
+    """
+    return(counts if isinstance(counts, np.ndarray) else counts.toarray())
+
+def count_nonzero(counts : Any) -> int:
+    if isinstance(counts, np.ndarray):
+        return(np.count_nonzero(counts))
+    return(counts.count_nonzero())
+
+def observed_crosstab(
+    counts : Any,
+    qdc_row : vs.QuestionDataContainer,
+    qdc_col : vs.QuestionDataContainer,
+    normalize : Union[bool, str, int] = False,
+    margins : bool = False,
+) -> Optional[pd.DataFrame]:
+    """Derive the table of pd.crosstab(rows, columns, normalize, margins) from 
+    a count table of "count_crosstab", where rows and columns are labels 
+    decoded by qdc_row and qdc_col. Like pd.crosstab, only observed labels 
+    are contained and sorted.
+
+    Args:
+        counts : a count table created by count_crosstab(df, qdc_col, qdc_row).
+        normalize : passed to pd.crosstab. 
+        margins : passed to pd.crosstab.
+
+    Returns:
+        None if values not contained in labels are found or labels can not 
+        be sorted. Use pd.crosstab for these cases.
+    """
+    labels_row = category_labels(qdc_row)
+    labels_col = category_labels(qdc_col)
+    if (count_nonzero(counts[len(labels_row):]) > 0) or (count_nonzero(counts[:, len(labels_col):]) > 0):
+        return(None)
+    counts = counts[:len(labels_row), :len(labels_col)]
+    rows = np.flatnonzero(np.asarray(counts.sum(axis=1)).ravel())
+    cols = np.flatnonzero(np.asarray(counts.sum(axis=0)).ravel())
+    try:
+        rows = sorted(rows, key=lambda i: labels_row[i])
+        cols = sorted(cols, key=lambda i: labels_col[i])
+    except TypeError:
+        return(None)
+    values = dense(counts[rows][:, cols]) if len(rows)*len(cols) else np.zeros((len(rows), len(cols)), dtype=np.int64)
+    index = pd.Index([ labels_row[i] for i in rows], name=qdc_row.var_name)
+    columns = pd.Index([ labels_col[i] for i in cols], name=qdc_col.var_name)
+    total_row = values.sum(axis=1)
+    total_col = values.sum(axis=0)
+    if isinstance(normalize, bool):
+        normalize = "all" if normalize else False
+    elif not isinstance(normalize, str):
+        normalize = {0 : "index", 1 : "columns"}.get(normalize, normalize)
+    if normalize in ["index", "columns", "all"]:
+        values = values.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if normalize == "index":
+                values = values/total_row[:, np.newaxis]
+            elif normalize == "columns":
+                values = values/total_col
+            else:
+                values = values/total_row.sum()
+        values = np.nan_to_num(values, nan=0.0)
+        total = total_row.sum()
+        if margins and (normalize in ["columns", "all"]):
+            values = np.hstack([values, (total_row/total)[:, np.newaxis]])
+            columns = columns.append(pd.Index(["All"]))
+        if margins and (normalize in ["index", "all"]):
+            all_row = total_col/total
+            if normalize == "all":
+                all_row = np.append(all_row, 1.0)
+            values = np.vstack([values, all_row])
+            index = index.append(pd.Index(["All"]))
+    elif normalize not in [False, None]:
+        raise Exception("Not a valid normalize argument")
+    elif margins:
+        values = np.vstack([values, total_col])
+        values = np.hstack([values, values.sum(axis=1, keepdims=True)])
+        index = index.append(pd.Index(["All"]))
+        columns = columns.append(pd.Index(["All"]))
+    index.name = qdc_row.var_name
+    columns.name = qdc_col.var_name
+    return(pd.DataFrame(values, index=index, columns=columns))
+
+def check_irregular_items(
+    counts : Any,
+    qdc : vs.QuestionDataContainer,
+    skip_miss : bool = False,
+) -> Tuple[List[Any], List[int]]:
+    """Raise an exception if a count table of "count_crosstab" has values 
+    other than "order" of qdc.
+
+    Returns:
+        Labels of columns and their positions in the count table.
+    """
+    cqdc = qdc.compile()
+    q_order = list(cqdc.order)
+    if skip_miss and (qdc.missing in q_order):
+        q_order.remove(qdc.missing)
+    # labels start with order so that position of each label in order is kept.
+    keep = [ i for i, label in enumerate(cqdc.order) if label in q_order]
+    ignored = keep + ([cqdc.missing_pos] if skip_miss and (cqdc.missing_pos >= 0) else [])
+    others = [ i for i in range(counts.shape[1]) if i not in ignored]
+    if count_nonzero(counts[:, others]) > 0:
+        s = f"Columns include some irregular items\n"
+        s += f"Values other than order are found.\ncols : {q_order}"
+        raise Exception(s)
+    return(q_order, keep)
+
+def crosstab_from_counts(
+    counts : np.ndarray,
+    qdc : vs.QuestionDataContainer,
+    qdc_strf : vs.QuestionDataContainer,
+    percentage : bool = True,
+    skip_miss : bool = False,
+    margins : bool = False,
+    normalize : str = "index",
+) -> pd.DataFrame:
+    """Derive the table of "crosstab_data" from a count table
+    created by "count_crosstab".
+
+    Args:
+        counts : a count table created by "count_crosstab". It can be
+            a scipy.sparse matrix.
+        percentage : If True, percentage is calculated.
+        skip_miss : If True, missing of qdc is excluded.
+        margins : If True, "All" row and/or column are added.
+        normalize : Takes "index" or "columns". Direction of percentage 
+            which is the same as that of pd.crosstab.
+    """
+    q_order, keep = check_irregular_items(counts, qdc, skip_miss=skip_miss)
+    q_strf_order = unique_order(qdc_strf)
+    counts = counts[:, keep]
+
+    # Margins include rows which are not contained in the order of qdc_strf.
+    n_strf = len(q_strf_order)
+    body = dense(counts[:n_strf])
+    total_col = np.asarray(counts.sum(axis=0)).ravel()
+    total_row = np.asarray(counts.sum(axis=1)).ravel()
+    total = counts.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if not percentage:
+            values = body
+            if margins:
+                values = np.vstack([values, total_col])
+                values = np.hstack([values, values.sum(axis=1, keepdims=True)])
+                q_strf_order = q_strf_order + ["All"]
+                q_order = q_order + ["All"]
+        elif normalize == "index":
+            row_sum = total_row[:n_strf, np.newaxis]
+            values = np.where(row_sum > 0, body/row_sum, 0.0)*100
+            if margins:
+                values = np.vstack([values, total_col/total*100])
+                q_strf_order = q_strf_order + ["All"]
+        elif normalize == "columns":
+            values = np.where(total_col > 0, body/total_col, 0.0)*100
+            if margins:
+                values = np.hstack([values, (total_row/total*100)[:n_strf, np.newaxis]])
+                q_order = q_order + ["All"]
+        else:
+            raise Exception("normalize takes 'index' or 'columns'")
+
+    tab = pd.DataFrame(
+        values,
+        index=pd.Index(q_strf_order, name=qdc_strf.var_name),
+        columns=pd.Index(q_order, name=qdc.var_name),
+    )
+    return(tab)
+
+@dataclass
+class CrosstabResult():
+    """Result of one cross tabulation. Number and percentage tables are
+    derived from one count table when they are accessed at first.
+
+    Args:
+        qdc : a qdc for columns.
+        qdc_strf : a qdc for stratification (rows).
+        counts : a count table created by "count_crosstab". 
+            Sums of weights if weighted.
+        margins : If True, "All" row and/or column are added to tables.
+        raw_counts : unweighted count table if counts is weighted.
+    """
+    qdc : vs.QuestionDataContainer
+    qdc_strf : vs.QuestionDataContainer
+    counts : np.ndarray
+    margins : bool = True
+    raw_counts : Optional[np.ndarray] = None
+    tables : Dict[Tuple[bool, bool, str], pd.DataFrame] = field(
+        default_factory=dict, repr=False)
+
+    def table(
+        self, 
+        percentage : bool = True, 
+        skip_miss : bool = False, 
+        normalize : str = "index",
+    ) -> pd.DataFrame:
+        """Table equivalent to that of "crosstab_data".
+        See "crosstab_from_counts" for parameters.
+        """
+        key = (percentage, skip_miss, normalize if percentage else None)
+        if key not in self.tables:
+            if self.raw_counts is not None:
+                # Irregular items with zero weights are also detected.
+                check_irregular_items(self.raw_counts, self.qdc, skip_miss=skip_miss)
+            self.tables[key] = crosstab_from_counts(
+                self.counts, self.qdc, self.qdc_strf, percentage=percentage,
+                skip_miss=skip_miss, margins=self.margins, normalize=normalize)
+        return(self.tables[key])
+
+    def add(
+        self, 
+        counts : np.ndarray, 
+        raw_counts : Optional[np.ndarray] = None,
+    ) -> "CrosstabResult":
+        """Add a count table of other rows, e.g. of another chunk of data.
+        Tables derived so far are discarded.
+
+        Args:
+            raw_counts : unweighted count table. Required if this result is weighted.
+        """
+        if (self.raw_counts is None) != (raw_counts is None):
+            weighted = "weighted" if self.raw_counts is not None else "unweighted"
+            raise Exception(f"raw_counts must be given if and only if the result is weighted. "
+                            f"This result is {weighted}.")
+        self.counts = self.counts + counts
+        if self.raw_counts is not None:
+            self.raw_counts = self.raw_counts + raw_counts
+        self.tables = {}
+        return(self)
+
+    @property
+    def number(self) -> pd.DataFrame:
+        return(self.table(percentage=False))
+
+    @property
+    def raw_number(self) -> Optional[pd.DataFrame]:
+        """Unweighted number. None if not weighted.
+        """
+        if self.raw_counts is None:
+            return(None)
+        if "raw" not in self.tables:
+            self.tables["raw"] = crosstab_from_counts(
+                self.raw_counts, self.qdc, self.qdc_strf, percentage=False,
+                margins=self.margins)
+        return(self.tables["raw"])
+
+    @property
+    def row_percentage(self) -> pd.DataFrame:
+        return(self.table(percentage=True, normalize="index"))
+
+    @property
+    def column_percentage(self) -> pd.DataFrame:
+        return(self.table(percentage=True, normalize="columns"))
+
+    @property
+    def row_percentage_skip_miss(self) -> pd.DataFrame:
+        return(self.table(percentage=True, skip_miss=True, normalize="index"))
+
+@dataclass
+class MultiBinariesResult():
+    """Result of tabulation of multiple binary question items.
+    Percentage is derived from the number of "yes" and the size of each stratum.
+    A stratum without rows has 0 percentage like "crosstab_from_counts".
+
+    Args:
+        number : the number of "yes" for each stratum (rows) and item (columns).
+            Sums of weights if weighted.
+        sizes : the number of rows of each stratum. Sums of weights if weighted.
+        raw_number : unweighted number if weighted.
+    """
+    number : pd.DataFrame
+    sizes : pd.Series
+    raw_number : Optional[pd.DataFrame] = None
+
+    @property
+    def percentage(self) -> pd.DataFrame:
+        sizes = self.sizes.loc[self.number.index]
+        # number has no NaN, so NaN comes only from strata without rows.
+        return((self.number.div(sizes.where(sizes > 0), axis=0)*100).fillna(0))
+
+def binary_flags(
+    df : pd.DataFrame,
+    q_var_names : List[str],
+    fetch_value : Any = 1,
+) -> np.ndarray:
+    """Boolean array of shape (len(df), len(q_var_names)) which is True
+    where an item equals "fetch_value". NaN is regarded as 0.
+    Only categories are compared for categorical columns.
+    """
+    items = df[q_var_names]
+    if not any( isinstance(t, pd.CategoricalDtype) for t in items.dtypes):
+        return((items.fillna(0) == fetch_value).to_numpy(dtype=bool))
+    flags = np.empty(items.shape, dtype=bool)
+    for j, var_name in enumerate(q_var_names):
+        ser = items[var_name]
+        if isinstance(ser.dtype, pd.CategoricalDtype):
+            # The last element is for code -1, that is NaN.
+            hit = np.append(np.asarray(ser.cat.categories == fetch_value, dtype=bool), 
+                            0 == fetch_value)
+            flags[:, j] = hit[ser.cat.codes.to_numpy()]
+        else:
+            flags[:, j] = (ser.fillna(0) == fetch_value).to_numpy(dtype=bool)
+    return(flags)
+
+def count_multi_binaries(
+    df : pd.DataFrame,
+    q_var_names : List[str],
+    qdc_strf : vs.QuestionDataContainer,
+    fetch_value : Any = 1,
+    positions_strf : Optional[np.ndarray] = None,
+    weights : Optional[str] = None,
+    with_raw : bool = False,
+) -> Tuple[np.ndarray, ...]:
+    """Count "fetch_value" of multiple binary items for each stratum.
+    NaN of items is regarded as 0. All items are compared with "fetch_value"
+    at once, and flags are summed up for each stratum by one grouped counting.
+
+    Args:
+        positions_strf : positions of qdc_strf if already decoded.
+        weights : a column name of weights. If given, weights are summed up.
+        with_raw : If True and weights is given, unweighted count table and
+            sizes are returned followed by weighted ones.
+
+    Returns:
+        A count table of shape (len(labels)+1, len(q_var_names)) and 
+        the number of rows of each stratum of shape (len(labels)+1,).
+        Labels follow "category_labels" of qdc_strf.
+    """
+    if positions_strf is None:
+        positions_strf = decode_column(df, qdc_strf)
+    n_strf = len(category_labels(qdc_strf)) + 1
+    n_items = len(q_var_names)
+    keep = positions_strf >= 0
+    flags = binary_flags(df, q_var_names, fetch_value)
+    rows, cols = np.nonzero(flags[keep])
+    idx = positions_strf[keep][rows].astype(np.int64)*n_items + cols
+
+    def count(w : Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        sizes = np.bincount(positions_strf[keep], weights=w, minlength=n_strf)
+        w = None if w is None else w[rows]
+        counts = np.bincount(idx, weights=w, minlength=n_strf*n_items).reshape(n_strf, n_items)
+        return(counts, sizes)
+
+    w = weights_array(df, weights)
+    if w is None:
+        return(count(None))
+    if with_raw:
+        return(count(None) + count(w[keep]))
+    return(count(w[keep]))
+
+def multi_binaries_from_counts(
+    counts : np.ndarray,
+    sizes : np.ndarray,
+    q_var_names : List[str],
+    qdcs_dic : Dict[str, vs.QuestionDataContainer],
+    qdc_strf : vs.QuestionDataContainer,
+    fetch_value : Any = 1,
+    raw_counts : Optional[np.ndarray] = None,
+) -> MultiBinariesResult:
+    """Create MultiBinariesResult from tables created by "count_multi_binaries".
+    Rows follow "order" of qdc_strf, and columns are labels of "fetch_value".
+
+    Args:
+        raw_counts : unweighted counts if counts are weighted.
+    """
+    labels = category_labels(qdc_strf)
+    order = unique_order(qdc_strf)
+    columns = [ qdcs_dic[l].dic[fetch_value] for l in q_var_names]
+    index = pd.Index(order, name=qdc_strf.var_name)
+    number = pd.DataFrame(counts[:len(order)], index=index, columns=columns)
+    sizes = pd.Series(sizes[:len(labels)], index=pd.Index(labels, name=qdc_strf.var_name))
+    raw_number = None
+    if raw_counts is not None:
+        raw_number = pd.DataFrame(raw_counts[:len(order)], index=index, columns=columns)
+    return(MultiBinariesResult(number, sizes, raw_number))
@@ -1,6 +1,7 @@
 from typing import Union, Optional, List, Dict, Tuple, Any
 from collections import OrderedDict
 import os
+import re
 import subprocess
 
 import numpy as np
@@ -57,65 +58,142 @@ def imputate_reorder_table(
     Returns: 
         Reordered table.
     """
-    cols_ = cols_.copy()
-    rows_ = rows_.copy()
-    for c in cols_:
-        if c not in table_.columns:
-            table_[c]=0
-    for i in rows_:
-        if i not in table_.index:
-            table_.loc[i]=0
+    cols_ = list(cols_)
+    rows_ = list(rows_)
 
     # Accept "All"
-    for c in table_.columns:
-        if c == "All":
-            cols_.append(c)
-    for i in table_.index:
-        if i == "All":
-            rows_.append(i)
+    if ("All" in table_.columns) and ("All" not in cols_):
+        cols_.append("All")
+    if ("All" in table_.index) and ("All" not in rows_):
+        rows_.append("All")
 
+    set_cols = set(cols_)
+    set_rows = set(rows_)
     if allow_except:
-        for c in table_.columns:
-            if c not in cols_:
-                cols_.append(c) 
-        for i in table_.index:
-            if i not in rows_:
-                rows_.append(i)
+        cols_ += [ c for c in table_.columns if c not in set_cols]
+        rows_ += [ i for i in table_.index if i not in set_rows]
     else:
-        if set(table_.columns) != set(cols_):
+        if not set(table_.columns) <= set_cols:
             s = f"Columns include some irregular items\n"
             s += f"original data : {table_.columns}\ncols : {cols_}"
             raise Exception(s)
 
-    table_ = table_[cols_] 
-    table_ = table_.loc[rows_]
+    table_ = table_.reindex(index=rows_, columns=cols_, fill_value=fill_value)
     return(table_)
 
+def is_excel_path(path : str) -> bool:
+    return(os.path.splitext(str(path))[1].lower() == ".xlsx")
+
+class NumberWriter():
+    def __init__(
+        self, 
+        path : str, 
+        mode : str = "w", 
+        excel : Optional[bool] = None,
+    ) -> None:
+        """Write number/percentage tables into one file through one opened handle.
+        A csv file starts with BOM once and each table is streamed when written.
+        An excel file has one sheet for each sheet_name.
+
+        Args:
+            path : a path of output file.
+            mode : "w" creates a new file, "a" appends tables to an existing csv file.
+            excel : If True, an excel file is written. If None, an excel file is 
+                written when the extension of path is ".xlsx".
+
+        Examples:
+            >>> with NumberWriter("number.csv") as writer:
+            >>>     output_crosstab_cate_barplot(df, qdc, qdc_strf, save_num_path=writer)
+        """
+        if excel is None:
+            excel = is_excel_path(path)
+        if excel and (mode != "w"):
+            raise Exception("Excel file can be written only with mode='w'")
+        self.path = path
+        self.mode = mode
+        self.excel = excel
+        self.open()
+
+    def open(self) -> None:
+        self.rows = {}
+        if self.excel:
+            self.handle = pd.ExcelWriter(self.path)
+        else:
+            self.handle = open(self.path, self.mode, encoding="utf_8_sig")
+
+    def close(self) -> None:
+        self.handle.close()
+
+    def reset(self) -> None:
+        """Delete tables written so far and restart writing.
+        """
+        self.close()
+        self.mode = "w"
+        self.open()
+
+    def __enter__(self) -> "NumberWriter":
+        return(self)
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(
+        self,
+        tab : pd.DataFrame, 
+        title : str = "",
+        decimal : Optional[int] = None,
+        sheet_name : Optional[str] = None,
+    ) -> None:
+        """Write a table following a title.
+
+        Args:
+            sheet_name : a sheet for excel. If None, title is used. 
+                Tables with the same sheet_name are written in one sheet.
+        """
+        if not isinstance(decimal, type(None)):
+            tab = tab.round(decimal)
+        if not self.excel:
+            self.handle.write(f"\n\n{title}\n" + tab.to_csv())
+            return
+
+        sheet_name = sheet_name if sheet_name else title
+        sheet_name = re.sub(r"[\[\]:*?/\\]", "_", str(sheet_name))[:31]
+        sheet_name = sheet_name if sheet_name else "Sheet1"
+        row = self.rows.get(sheet_name, 0)
+        pd.DataFrame([[title]]).to_excel(self.handle, sheet_name=sheet_name, 
+                                         startrow=row, header=False, index=False)
+        tab.to_excel(self.handle, sheet_name=sheet_name, startrow=row+1)
+        self.rows[sheet_name] = row + 1 + tab.columns.nlevels + len(tab) + 2
+
 def save_number_to_data(
     tab : pd.DataFrame, 
-    save_num_path : str,
+    save_num_path : Union[str, NumberWriter],
     title : str = "",
     decimal : Optional[int] = None,
+    sheet_name : Optional[str] = None,
 ) -> None:
     """Add the number to data.
+    If save_num_path is a NumberWriter, the table is written through it.
+    Otherwise the table is appended to the csv file.
+    An excel file can not be appended, so pass a NumberWriter for it.
     """
-    if not isinstance(decimal, type(None)):
-        tab = tab.round(decimal)
-
-    if os.path.exists(save_num_path):
-        with open(save_num_path, "r", encoding="utf_8_sig") as f:
-            s = f.read()
+    if isinstance(save_num_path, NumberWriter):
+        save_num_path.write(tab, title=title, decimal=decimal, sheet_name=sheet_name)
+    elif is_excel_path(save_num_path):
+        s = f"Tables can not be appended to an excel file : {save_num_path}\n"
+        s += "Open utils.NumberWriter(path) and pass it as save_num_path."
+        raise Exception(s)
     else:
-        s = ""
-
-    s += f"\n\n{title}\n" + tab.to_csv()
-
-    with open(save_num_path, "w", encoding="utf_8_sig") as f:
-        f.write(s)
+        with NumberWriter(save_num_path, mode="a", excel=False) as writer:
+            writer.write(tab, title=title, decimal=decimal)
 
-def delete_and_create_csv(save_num_path : str) -> None:
+def delete_and_create_csv(save_num_path : Union[str, NumberWriter]) -> None:
     """Delete and create csv file.
+    If save_num_path is a NumberWriter, tables written so far are deleted.
     """
+    if isinstance(save_num_path, NumberWriter):
+        save_num_path.reset()
+        return
     if os.path.exists(save_num_path):
         os.remove(save_num_path)
     with open(save_num_path,"w") as f:
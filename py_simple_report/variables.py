@@ -1,5 +1,12 @@
 from dataclasses import dataclass
 from typing import Union, Optional, List, Dict, Tuple, Any
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# Fields compiled by QuestionDataContainer.compile.
+COMPILED_FIELDS = ("var_name", "missing", "dic", "order")
 
 @dataclass
 class QuestionDataContainer():
@@ -17,6 +24,168 @@ class QuestionDataContainer():
         for k in ["var_name","desc", "title", "missing", "dic", "order"]:
             print(f"{k} : {getattr(self,k)}")
 
+    def __setattr__(self, name : str, value : Any) -> None:
+        if name in COMPILED_FIELDS:
+            self.__dict__.pop("_compiled", None)
+        object.__setattr__(self, name, value)
+
+    def compile(self) -> "CompiledQuestionDataContainer":
+        """Compile "order" and "dic" into lookup tables. 
+        The result is cached until var_name, missing, dic or order is assigned.
+        If "dic" or "order" is edited in place, call "clear_compiled".
+
+        Examples:
+            >>> qdc.order = ["yes", "no"] # The cache is cleared.
+            >>> qdc.order.append("missing")
+            >>> qdc.clear_compiled()
+        """
+        compiled = self.__dict__.get("_compiled")
+        if compiled is None:
+            compiled = CompiledQuestionDataContainer.from_qdc(self)
+            self.__dict__["_compiled"] = compiled
+        return(compiled)
+
+    def clear_compiled(self) -> None:
+        """Clear the result of "compile" after "dic" or "order" is edited in place.
+        """
+        self.__dict__.pop("_compiled", None)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The compiled cache is rebuilt when needed, so it is not copied or pickled.
+        return({ k : v for k, v in self.__dict__.items() if k != "_compiled"})
+
+    def __setstate__(self, state : Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+
+@dataclass(repr=False)
+class NestedQuestionDataContainer(QuestionDataContainer):
+    """Stratification by combinations of categories of multiple qdcs,
+    e.g. sex x age. Each label joins labels of qdcs with "sep", and "order" 
+    is the product of "order" of qdcs. Create it by "from_qdcs".
+
+    Args:
+        qdcs : qdcs combined. The first one changes slowest in "order".
+        sep : separator of labels.
+    """
+    qdcs : Optional[List[QuestionDataContainer]] = None
+    sep : str = ", "
+
+    @classmethod
+    def from_qdcs(
+        cls, 
+        qdcs : List[QuestionDataContainer], 
+        sep : str = ", ",
+    ) -> "NestedQuestionDataContainer":
+        """
+        Examples:
+            >>> qdc_nested = NestedQuestionDataContainer.from_qdcs([qdcs_dic["sex"], qdcs_dic["age"]])
+            >>> qdc_nested.var_name
+            'sex-age'
+        """
+        qdcs = list(qdcs)
+        orders = [ qdc.compile().order for qdc in qdcs]
+        order = [ sep.join(map(str, labels)) for labels in itertools.product(*orders)]
+        return(cls(
+            var_name = "-".join(qdc.var_name for qdc in qdcs),
+            title = " x ".join(str(qdc.title) for qdc in qdcs),
+            order = order,
+            qdcs = qdcs,
+            sep = sep,
+        ))
+
+def is_nan_key(k : Any) -> bool:
+    """Return True if k is a key for NaN like np.nan inserted by item_str2dict.
+    """
+    return(isinstance(k, float) and np.isnan(k))
+
+def code_dtype(n : int) -> np.dtype:
+    """Smallest signed integer dtype which can hold -1 to n.
+    """
+    for dtype in [np.int8, np.int16, np.int32]:
+        if n <= np.iinfo(dtype).max:
+            return(np.dtype(dtype))
+    return(np.dtype(np.int64))
+
+@dataclass(frozen=True, eq=False)
+class CompiledQuestionDataContainer():
+    """Frozen lookup tables of QuestionDataContainer created by 
+    QuestionDataContainer.compile. 
+
+    Args:
+        var_name : variable name shared with original data.
+        missing : a label of missing.
+        order : labels of "order" without duplication.
+        labels : "order" followed by labels of "dic" not contained in "order".
+        missing_pos : position of missing in labels. -1 if not contained.
+        nan_pos : position assigned to NaN. -1 if NaN is not converted by dic.
+        keys : values converted into labels.
+        key_positions : positions in labels for each of keys. 
+        lookup : integer lookup array from numerical codes to positions. 
+            None if some numerical codes are not small non-negative integers.
+        code_dtype : integer dtype of positions.
+        dtype : categorical dtype whose categories are labels.
+    """
+    __slots__ = ("var_name", "missing", "order", "labels", "missing_pos", "nan_pos",
+                 "keys", "key_positions", "lookup", "code_dtype", "dtype")
+    var_name : Optional[str]
+    missing : Optional[str]
+    order : Tuple[Any, ...]
+    labels : Tuple[Any, ...]
+    missing_pos : int
+    nan_pos : int
+    keys : pd.Index
+    key_positions : np.ndarray
+    lookup : Optional[np.ndarray]
+    code_dtype : np.dtype
+    dtype : pd.CategoricalDtype
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return({ k : getattr(self, k) for k in self.__slots__})
+
+    def __setstate__(self, state : Dict[str, Any]) -> None:
+        # Frozen, so copy and pickle can not restore slots by setattr.
+        for k, v in state.items():
+            object.__setattr__(self, k, v)
+
+    @classmethod
+    def from_qdc(cls, qdc : QuestionDataContainer) -> "CompiledQuestionDataContainer":
+        dic = qdc.dic if qdc.dic else {}
+        order = qdc.order if qdc.order is not None else []
+        order = tuple(dict.fromkeys(order))
+        labels = tuple(dict.fromkeys(order + tuple(dic.values())))
+        n = len(labels)
+        label_pos = { label : i for i, label in enumerate(labels)}
+        key_pos = { label : i for label, i in label_pos.items() if not is_nan_key(label)}
+        nan_pos = -1
+        for k, v in dic.items():
+            if is_nan_key(k):
+                nan_pos = label_pos[v]
+            else:
+                key_pos[k] = label_pos[v]
+        dtype = code_dtype(n)
+
+        num_keys = [ k for k in key_pos.keys() if isinstance(k, (int, float, np.number))]
+        if all( float(k).is_integer() and (0 <= k < 2**16) for k in num_keys):
+            lookup = np.full(int(max(num_keys, default=0)) + 1, n, dtype=dtype)
+            for k in num_keys:
+                lookup[int(k)] = key_pos[k]
+        else:
+            lookup = None
+
+        return(cls(
+            var_name = qdc.var_name,
+            missing = qdc.missing,
+            order = order,
+            labels = labels,
+            missing_pos = label_pos.get(qdc.missing, -1),
+            nan_pos = nan_pos,
+            keys = pd.Index(list(key_pos.keys()), dtype=object),
+            key_positions = np.array(list(key_pos.values()), dtype=dtype),
+            lookup = lookup,
+            code_dtype = dtype,
+            dtype = pd.CategoricalDtype(list(labels)),
+        ))
+
 @dataclass(repr=True)
 class VisVariables():
     """This class controls visualization schemes. See each attribute explanation 
@@ -1,6 +1,10 @@
 from typing import Union, Optional, List, Dict, Tuple, Any
+import functools
 
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import matplotlib.patches as mpatches
 import matplotlib.cm as cm
 import matplotlib.dates as mdates
@@ -15,6 +19,7 @@ import cmocean
 import contextplt as cplt
 
 from . import variables as vs
+from . import utils
 
 def heatmap_crosstab(
     tab : pd.DataFrame, 
@@ -60,32 +65,87 @@ def heatmap_crosstab(
 
 class SingleVis():
     def __init__(self, vis_var : vs.VisVariables) -> None:
-        """
+        """Figure is created without pyplot unless it is shown, so that 
+        figures can be rendered in threads independently.
         """
         self.vis_var = vis_var
-        self.fig = plt.figure(figsize=vis_var.figsize, dpi=vis_var.dpi)
+        if vis_var.show:
+            self.fig = plt.figure(figsize=vis_var.figsize, dpi=vis_var.dpi)
+        else:
+            self.fig = Figure(figsize=vis_var.figsize, dpi=vis_var.dpi)
+            FigureCanvasAgg(self.fig)
         self.ax = self.fig.add_subplot(111)
 
-    def adjust_figure(self) -> None:
+    def close(self) -> None:
+        """Release the figure from pyplot if it is managed by pyplot.
+        """
+        if self.vis_var.show:
+            plt.close(self.fig)
+
+    def adjust_figure(self, variants : bool = False) -> None:
+        """Adjust the figure, then save and show it.
+
+        Args:
+            variants : If True, a figure without legend and a legend only figure
+                are also saved from this figure. See utils.PathOutput for paths.
+        """
         vis_var = self.vis_var
         self.ax.set_title(vis_var.title, y=vis_var.titley)
         self.ax.set_xlabel(vis_var.xlabel, fontsize=vis_var.xlabelsize)
         self.ax.set_ylabel(vis_var.ylabel, fontsize=vis_var.ylabelsize)
         self.ax.set_xlim(vis_var.xlim) if vis_var.xlim else None
         self.ax.set_ylim(vis_var.ylim) if vis_var.ylim else None
-        plt.xticks(rotation=vis_var.xrotation)
-        plt.yticks(rotation=vis_var.yrotation)
+        for label in self.ax.get_xticklabels():
+            label.set_rotation(vis_var.xrotation)
+        for label in self.ax.get_yticklabels():
+            label.set_rotation(vis_var.yrotation)
 
         self.ax.tick_params(axis='x', which='major', labelsize=vis_var.xticksize)
         self.ax.tick_params(axis='y', which='major', labelsize=vis_var.yticksize)
 
-        plt.tight_layout()
+        self.fig.tight_layout()
         if not isinstance(vis_var.save_fig_path, type(None)):
-            plt.savefig(vis_var.save_fig_path, facecolor="white", bbox_inches="tight")
+            self.fig.savefig(vis_var.save_fig_path, facecolor="white", bbox_inches="tight")
         if vis_var.show:
             plt.show()
-        else:
-            plt.close()
+        if variants and (not isinstance(vis_var.save_fig_path, type(None))):
+            self.save_variants(utils.PathOutput(vis_var.save_fig_path))
+        self.close()
+
+    def save_variants(self, path_output : utils.PathOutput) -> None:
+        """Save a legend only figure and a figure without legend 
+        from the already rendered figure.
+        """
+        legend = self.ax.get_legend()
+        if legend is None:
+            return
+        self.save_legend_only(path_output.label_only)
+        legend.remove()
+        self.fig.tight_layout()
+        self.fig.savefig(path_output.no_label, facecolor="white", bbox_inches="tight")
+
+    def save_legend_only(self, path : str) -> None:
+        """Save the region of the legend only. Other artists and the background
+        are hidden while saving.
+        """
+        legend = self.ax.get_legend()
+        hidden = [ a for a in self.ax.get_children() 
+                   if (a is not legend) and a.get_visible()]
+        hidden.append(self.fig.patch)
+        for a in hidden:
+            a.set_visible(False)
+        frame_on = legend.get_frame_on()
+        legend.set_frame_on(False)
+
+        bbox = (legend.get_window_extent()
+                .transformed(self.fig.dpi_scale_trans.inverted())
+                .padded(0.1)
+               )
+        self.fig.savefig(path, bbox_inches=bbox)
+
+        legend.set_frame_on(frame_on)
+        for a in hidden:
+            a.set_visible(True)
 
     def create_labels(self, tab : pd.DataFrame, 
                       missing : Optional[str] = None,
@@ -99,13 +159,12 @@ class SingleVis():
         self.ax.axis('off')
         self.ax.axes.xaxis.set_visible(False)
         self.ax.axes.yaxis.set_visible(False)
-        plt.legend(handles=patches, frameon=False)
+        self.ax.legend(handles=patches, frameon=False)
         if not isinstance(self.vis_var.save_fig_path, type(None)):
-            plt.savefig(self.vis_var.save_fig_path, bbox_inches="tight")
+            self.fig.savefig(self.vis_var.save_fig_path, bbox_inches="tight")
         if self.vis_var.show:
             plt.show()
-        else:
-            plt.close()
+        self.close()
 
     def one_cate_bar_plot(self, tab : pd.Series) -> None:
         self.ax.bar(tab.index, tab.values, **self.vis_var.main_kwgs)
@@ -116,6 +175,7 @@ class SingleVis():
         tab : pd.DataFrame,
         legend = True,
         percentage : bool = True,
+        variants : bool = False,
     ) -> None:
         ax = tab.plot(kind="bar", ax=self.ax, stacked=False, color=self.vis_var.colors, 
                  **self.vis_var.main_kwgs)
@@ -126,13 +186,14 @@ class SingleVis():
             self.ax.legend(bbox_to_anchor=(1,1))
         else:
             self.ax.get_legend().remove()
-        self.adjust_figure()
+        self.adjust_figure(variants=variants)
 
     def crosstab_cate_stacked_barplot(
         self, 
         tab: pd.DataFrame, 
         legend=True, 
         percentage:bool=True,
+        variants : bool = False,
     ) -> None:
         ax = tab.plot(kind="barh", ax=self.ax, stacked=True, color=self.vis_var.colors,
                  **self.vis_var.main_kwgs)
@@ -150,9 +211,14 @@ class SingleVis():
             self.ax.legend(bbox_to_anchor=(1,1))
         else:
             self.ax.get_legend().remove()
-        self.adjust_figure()
+        self.adjust_figure(variants=variants)
 
-    def barplot_multi_binaries_with_strat(self, tab : pd.DataFrame, legend=True) -> None:
+    def barplot_multi_binaries_with_strat(
+        self, 
+        tab : pd.DataFrame, 
+        legend=True, 
+        variants : bool = False,
+    ) -> None:
         self.vis_var.main_kwgs["width"] = self.vis_var.main_kwgs.get("width",0.9)
         tab.plot(kind="bar", ax=self.ax, stacked=False, color=self.vis_var.colors,
                  **self.vis_var.main_kwgs)
@@ -162,7 +228,7 @@ class SingleVis():
             self.ax.legend(bbox_to_anchor=(1,1))
         else:
             self.ax.get_legend().remove()
-        self.adjust_figure()
+        self.adjust_figure(variants=variants)
 
 def format_percentage(ax, axis="x"):
     # add %.
@@ -203,24 +269,29 @@ def annotate_horizontal_stacked_barplot(
         fmt : string format for annotation.
         cutoff_annotate : If a value is smaller than this value, number/pecentage are hidden.
     """
-    pos = (get_bbox_positions_as_df(ax)
-           .sort_values(by=["y0", "x0", "x1"])
-           .reset_index(drop=True)
-          )
-    for i in range(n_rows):
-        st = i*n_cols
-        fin = (i+1)*n_cols
-        dfM = pos.loc[pos.index[st:fin]]
-        #display(each)
-        v = dfM["x1"]
-        v_1 = v.shift(1).replace(np.nan,0)
-        dfM["cate"] = v.sub(v_1)
-        for i,b in dfM.iterrows():
-            val = f"{b.cate:{fmt}}"
-            if b.cate > cutoff_annotate:
-                x_pos = b.x0 + x_offset
-                y_pos = b.y0*3/4 + b.y1*1/4 + y_offset
-                ax.annotate(val,  (x_pos , y_pos), color=b.color, fontsize=fontsize)
+    pos = get_bbox_positions(ax)
+    # Patches of each row are ordered from left to right.
+    idx = np.lexsort((pos["x1"], pos["x0"], pos["y0"]))[:n_rows*n_cols]
+    x1 = pos["x1"][idx].reshape(n_rows, n_cols)
+    cate = np.diff(x1, axis=1, prepend=0).ravel()
+    x_pos = pos["x0"][idx] + x_offset
+    y_pos = pos["y0"][idx]*3/4 + pos["y1"][idx]*1/4 + y_offset
+    colors = pos["color"][idx]
+    for i in np.flatnonzero(cate > cutoff_annotate):
+        ax.annotate(f"{cate[i]:{fmt}}", (x_pos[i], y_pos[i]), color=colors[i], fontsize=fontsize)
+
+def get_bbox_positions(ax, cutoff_bright : float = 0.75) -> Dict[str, np.ndarray]:
+    """Get bbox positions of barplot and text colors(white/black) as arrays.
+    See get_bbox_positions_as_df.
+    """
+    n = len(ax.patches)
+    bbox = np.array([ p.get_bbox().get_points().ravel() for p in ax.patches]).reshape(n, 4)
+    facecolor = np.array([ p.get_facecolor() for p in ax.patches]).reshape(n, 4)
+    bright = facecolor[:, :3].max(axis=1)
+    color = np.where(bright <= cutoff_bright, "white", "black").astype(object)
+    dic = dict(x0=bbox[:,0], x1=bbox[:,2], y0=bbox[:,1], y1=bbox[:,3], 
+               bright=bright, color=color)
+    return(dic)
 
 def get_bbox_positions_as_df(ax, cutoff_bright : float = 0.75) -> pd.DataFrame:
     """Get bbox positions of barplot to show number/percentage as annotations.
@@ -232,18 +303,7 @@ def get_bbox_positions_as_df(ax, cutoff_bright : float = 0.75) -> pd.DataFrame:
     Returns:
         DataFrame of positions and brightness, and text color. 
     """
-    dic = dict(x0=[], x1=[], y0=[], y1=[], bright=[], color=[])
-    for p in ax.patches:
-        # Positions.
-        b = p.get_bbox()
-        for pos in ["x0","x1","y0","y1"]:
-            dic[pos].append(getattr(b,pos))
-        # Brightness. 
-        bright = max(p.get_facecolor()[:3])
-        c = "white" if bright <= cutoff_bright else "black"
-        dic["bright"].append(bright)
-        dic["color"].append(c)
-    df = pd.DataFrame(dic)
+    df = pd.DataFrame(get_bbox_positions(ax, cutoff_bright))
     return(df)
 
 def create_patch_for_label(
@@ -278,23 +338,14 @@ def create_patch_for_label(
         >>> plt.show()
     """
     if isinstance(color, type(None)):
-        cmap = get_cmap(cmap_type, cmap_name)
-        cmap_cont = judge_cmap_is_continuous_or_not(cmap_type, cmap_name)
+        color = palette(cmap_type, cmap_name, label_names, missing)
     patches = []
     #for c, name in zip(["blue","orange","green"],["男","女","不明"]):
     if marker is None:
         marker = [ None for i in range(len(label_names))]
 
-    n = len(label_names)
     for i, name in enumerate(label_names):
-        if name == missing:
-            c = "grey"
-        elif not isinstance(color, type(None)):
-            c = color[i]
-        elif cmap_cont:
-            c = cmap(i/n)
-        else:
-            c = cmap(i)
+        c = "grey" if name == missing else color[i]
 
         if line:
             patch = Line2D([0], [0], color=c, label=name, 
@@ -326,19 +377,55 @@ def obtain_cmap4labels(
         missing : a string of missing.
         vis_var : Visualization parameters.
     """
-    cmap = get_cmap(vis_var.cmap_type, vis_var.cmap_name)
-    cmap_cont = judge_cmap_is_continuous_or_not(vis_var.cmap_type, vis_var.cmap_name)
-    colors = []
-    n = len(order)
-    for i, name in enumerate(order):
-        if name == missing:
-            c = "grey"
-        else:
-            c = cmap(i/n) if cmap_cont else cmap(i)
-        colors.append(c)
-    vis_var.colors = colors
+    colors = palette(vis_var.cmap_type, vis_var.cmap_name, order, missing)
+    vis_var.colors = [ tuple(c) for c in colors]
     return(vis_var)
 
+PALETTE_CACHE_SIZE = 256
+
+def palette(
+    cmap_type : str,
+    cmap_name : str,
+    order : List[Any],
+    missing : Any,
+) -> np.ndarray:
+    """Sample RGBA colors for labels from a colormap. Label equal to missing
+    is colored grey. Results are cached for each 
+    (cmap_type, cmap_name, order, missing), see palette_cache_info.
+
+    Args:
+        cmap_type : Takes "matplotlib" or "cmocean"
+        cmap_name : a color map name.
+        order : order of labels.
+        missing : a label of missing.
+
+    Returns:
+        Read-only array of shape (len(order), 4).
+    """
+    return(_palette(cmap_type, cmap_name, tuple(order), missing))
+
+@functools.lru_cache(maxsize=PALETTE_CACHE_SIZE)
+def _palette(cmap_type : str, cmap_name : str, order : Tuple[Any], missing : Any) -> np.ndarray:
+    cmap = get_cmap(cmap_type, cmap_name)
+    n = len(order)
+    if judge_cmap_is_continuous_or_not(cmap_type, cmap_name):
+        colors = cmap(np.arange(n)/n)
+    else:
+        colors = cmap(np.arange(n))
+    colors = np.array(colors, dtype=float).reshape(n, 4)
+    is_missing = np.array([ name == missing for name in order], dtype=bool)
+    colors[is_missing] = mcolors.to_rgba("grey")
+    colors.setflags(write=False)
+    return(colors)
+
+def palette_cache_info() -> functools._CacheInfo:
+    """Return hits, misses, maxsize and currsize of the palette cache.
+    """
+    return(_palette.cache_info())
+
+def clear_palette_cache() -> None:
+    _palette.cache_clear()
+
 def get_cmap(cmap_type : str = "cmocean", cmap_name : str = "haline") -> Any:
     """Get cmap from matplotlib or cmocean. 
 
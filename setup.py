@@ -23,7 +23,11 @@ INSTALL_REQUIRES = [
     'contextplt>=0.2.4',
 ] 
 
-EXTRAS_REQUIRE = {}
+EXTRAS_REQUIRE = {
+    'excel': ['openpyxl'],
+    'parquet': ['pyarrow'],
+    'sparse': ['scipy'],
+}
 
 PACKAGES = [
     "py_simple_report"